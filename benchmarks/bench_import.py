@@ -0,0 +1,73 @@
+"""Import-time budget for the hyprhalt entry point.
+
+Runs ``python -X importtime`` on ``daemon.main`` and fails if importing it
+takes longer than the budget or pulls in modules that belong on the
+shutdown path only.
+
+Usage: python benchmarks/bench_import.py [budget_ms]
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Modules that must only be imported once a shutdown actually starts
+FORBIDDEN = (
+    "gi",
+    "dbus",
+    "tomllib",
+    "daemon.shutdown_manager",
+    "daemon.dbus_service",
+    "daemon.resident",
+)
+
+
+def measure() -> tuple[int, set[str]]:
+    """Return cumulative import time of daemon.main in µs and all imported modules."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import daemon.main"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    cumulative = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if not cum.isdigit():
+            continue
+        modules.add(name)
+        if name == "daemon.main":
+            cumulative = int(cum)
+    return cumulative, modules
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 40.0
+
+    runs = [measure() for _ in range(5)]
+    best = min(cum for cum, _ in runs) / 1000
+    modules = runs[0][1]
+
+    print(f"daemon.main import: {best:.2f} ms (budget {budget_ms:.2f} ms)")
+
+    failed = False
+    leaked = sorted(m for m in modules if m.split(".")[0] in FORBIDDEN or m in FORBIDDEN)
+    if leaked:
+        print(f"FAIL: shutdown-only modules imported eagerly: {', '.join(leaked)}")
+        failed = True
+    if best > budget_ms:
+        print("FAIL: import time over budget")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Compare j/clients fetching and decoding strategies.
+
+Serves a synthetic j/clients reply shaped like Hyprland's (pretty-printed,
+about 850 bytes per window) from a stand-in ``.socket.sock`` and times,
+per request:
+
+- legacy:  recv() chunks joined with ``+=``, decoded to str, json.loads
+- clients: get_clients(), recv_into one buffer and json.loads on bytes
+- fields:  get_client_fields(), address/pid/class/xwayland only
+- pids:    client_pids(), PIDs only, the narrowest projection
+
+It then delays every reply to mimic a compositor under load and reports
+the longest main loop stall while 5 j/clients are requested at once,
+through blocking client_pids() calls and through AsyncIPC, along
+with the connections each needed. The AsyncIPC part needs PyGObject.
+
+Usage: python benchmarks/bench_ipc.py [iterations]
+"""
+
+import json
+import os
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from daemon import hyprland_ipc  # noqa: E402
+
+SIGNATURE = "hyprhalt_bench"
+PID_RE = re.compile(rb'"pid":\s*(-?\d+)')
+
+
+def make_clients(count: int) -> bytes:
+    clients = []
+    for i in range(count):
+        app_class = f"org.example.App{i % 37}"
+        clients.append(
+            {
+                "address": f"0x{0x55d0000000 + i:x}",
+                "mapped": True,
+                "hidden": False,
+                "at": [10, 20],
+                "size": [800, 600],
+                "workspace": {"id": i % 10, "name": str(i % 10)},
+                "floating": False,
+                "pseudo": False,
+                "monitor": 0,
+                "class": app_class,
+                "title": f'Document {i} "draft" — Editor',
+                "initialClass": app_class,
+                "initialTitle": "Editor",
+                "pid": 10000 + i,
+                "xwayland": i % 5 == 0,
+                "pinned": False,
+                "fullscreen": 0,
+                "fullscreenClient": 0,
+                "grouped": [],
+                "tags": [],
+                "swallowing": "0x0",
+                "focusHistoryID": i,
+                "inhibitingIdle": False,
+                "xdgTag": "",
+                "xdgDescription": "",
+            }
+        )
+    return json.dumps(clients, indent=4, ensure_ascii=False).encode()
+
+
+def serve(server: socket.socket, holder: dict):
+    while True:
+        conn, _ = server.accept()
+        holder["connections"] += 1
+        with conn:
+            conn.recv(4096)
+            time.sleep(holder["delay"])
+            try:
+                conn.sendall(holder["reply"])
+            except OSError:
+                # The client gave up waiting
+                pass
+
+
+def legacy_clients() -> list[dict]:
+    """The pre-recv_into send_command plus get_clients, kept for comparison."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(5.0)
+    try:
+        sock.connect(hyprland_ipc.get_socket_path())
+        sock.sendall(b"j/clients")
+        response = b""
+        while True:
+            chunk = sock.recv(8192)
+            if not chunk:
+                break
+            response += chunk
+        return json.loads(response.decode(errors="replace"))
+    finally:
+        sock.close()
+
+
+def client_pids() -> set[int]:
+    """Only the window owner PIDs out of a raw j/clients reply."""
+    return {int(pid) for pid in PID_RE.findall(hyprland_ipc.send_command_raw("j/clients"))}
+
+
+def bench(func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def stall_blocking(requests: int) -> float:
+    """Longest stall when each caller queries the compositor itself."""
+    longest = 0.0
+    for _ in range(requests):
+        start = time.perf_counter()
+        client_pids()
+        longest = max(longest, time.perf_counter() - start)
+    return longest * 1000
+
+
+def stall_async(requests: int) -> float:
+    """Longest main loop stall while AsyncIPC serves the same callers."""
+    from gi.repository import GLib
+
+    from daemon.async_ipc import AsyncIPC
+
+    loop = GLib.MainLoop()
+    ipc = AsyncIPC()
+    state = {"replies": 0, "last": time.perf_counter(), "longest": 0.0}
+
+    def on_reply(reply):
+        assert reply is not None
+        state["replies"] += 1
+        if state["replies"] == requests:
+            loop.quit()
+
+    def tick():
+        now = time.perf_counter()
+        state["longest"] = max(state["longest"], now - state["last"])
+        state["last"] = now
+        return True
+
+    def ask():
+        for _ in range(requests):
+            ipc.request("j/clients", on_reply)
+        return False
+
+    timer = GLib.timeout_add(5, tick)
+    GLib.idle_add(ask)
+    loop.run()
+    GLib.source_remove(timer)
+    return state["longest"] * 1000
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    runtime_dir = tempfile.mkdtemp(prefix="hyprhalt-bench-")
+    instance_dir = Path(runtime_dir) / "hypr" / SIGNATURE
+    instance_dir.mkdir(parents=True)
+    os.environ["XDG_RUNTIME_DIR"] = runtime_dir
+    os.environ["HYPRLAND_INSTANCE_SIGNATURE"] = SIGNATURE
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(instance_dir / ".socket.sock"))
+    server.listen(16)
+    holder = {"connections": 0, "delay": 0.0}
+    threading.Thread(target=serve, args=(server, holder), daemon=True).start()
+
+    print(f"{'clients':>8} {'KiB':>7} {'legacy':>9} {'clients':>9} {'fields':>9} {'pids':>9}  (ms/request)")
+    for count in (10, 100, 1000):
+        holder["reply"] = make_clients(count)
+        # The projection must agree with a full decode
+        expected = [
+            (c["address"], c["pid"], c["class"], c["xwayland"]) for c in hyprland_ipc.get_clients()
+        ]
+        assert [tuple(c) for c in hyprland_ipc.get_client_fields()] == expected
+
+        legacy = bench(legacy_clients, iterations)
+        clients = bench(hyprland_ipc.get_clients, iterations)
+        fields = bench(hyprland_ipc.get_client_fields, iterations)
+        pids = bench(client_pids, iterations)
+        print(
+            f"{count:>8} {len(holder['reply']) / 1024:7.0f} {legacy:9.3f} {clients:9.3f} "
+            f"{fields:9.3f} {pids:9.3f}"
+        )
+
+    holder["reply"] = make_clients(100)
+    holder["delay"] = 0.5
+    requests = 5
+    print()
+    print(f"Compositor replying after {holder['delay'] * 1000:.0f} ms, {requests} callers:")
+    holder["connections"] = 0
+    blocking = stall_blocking(requests)
+    print(f"  blocking: longest stall {blocking:7.1f} ms, {holder['connections']} connections")
+    try:
+        holder["connections"] = 0
+        nonblocking = stall_async(requests)
+    except ImportError as e:
+        print(f"  AsyncIPC: skipped ({e})")
+        return
+    print(f"  AsyncIPC: longest stall {nonblocking:7.1f} ms, {holder['connections']} connections")
+
+
+if __name__ == "__main__":
+    main()
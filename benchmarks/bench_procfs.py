@@ -0,0 +1,71 @@
+"""Compare the /proc snapshot against the old per-PID Path scan.
+
+Usage: python benchmarks/bench_procfs.py [iterations]
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from daemon.procfs import ProcSnapshot  # noqa: E402
+
+
+def legacy_children(parent_pid: int) -> list[tuple[int, str]]:
+    """The pre-snapshot get_hyprland_children scan, kept for comparison."""
+    children = []
+    for pid_dir in Path("/proc").iterdir():
+        if not pid_dir.name.isdigit():
+            continue
+        stat_file = pid_dir / "stat"
+        if not stat_file.exists():
+            continue
+        try:
+            with open(stat_file) as f:
+                parts = f.read().split(")")
+                if len(parts) < 2:
+                    continue
+                fields = parts[1].strip().split()
+                if len(fields) < 2 or int(fields[1]) != parent_pid:
+                    continue
+                comm_file = pid_dir / "comm"
+                if comm_file.exists():
+                    with open(comm_file) as cf:
+                        name = cf.read().strip()
+                else:
+                    name = "unknown"
+                children.append((int(pid_dir.name), name))
+        except (IOError, ValueError):
+            continue
+    return children
+
+
+def snapshot_children(parent_pid: int) -> list[tuple[int, str]]:
+    snapshot = ProcSnapshot.take()
+    return [(r.pid, r.comm) for r in snapshot.children_of(parent_pid)]
+
+
+def bench(func, parent_pid: int, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(parent_pid)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    parent_pid = os.getppid()
+    nprocs = sum(1 for name in os.listdir("/proc") if name.isdigit())
+
+    legacy = bench(legacy_children, parent_pid, iterations)
+    snapshot = bench(snapshot_children, parent_pid, iterations)
+
+    print(f"{nprocs} processes, {iterations} iterations")
+    print(f"  legacy Path scan: {legacy:8.3f} ms")
+    print(f"  ProcSnapshot:     {snapshot:8.3f} ms  ({legacy / snapshot:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
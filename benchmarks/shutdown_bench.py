@@ -0,0 +1,488 @@
+"""End-to-end shutdown benchmark against a stand-in Hyprland.
+
+Starts a fake Hyprland IPC server (``.socket.sock`` and ``.socket2.sock``)
+plus a ``hyprland.lock`` in a temporary ``XDG_RUNTIME_DIR``, forks a fleet
+of synthetic app processes that each own one window, then runs
+``daemon.main --no-fork`` against it and reports:
+
+- time from invocation until the first closewindow arrives
+- wall time until ``dispatch exit`` and until the daemon exits
+- IPC round trips (connections to ``.socket.sock``) and batched commands
+- read/write syscalls of the daemon, from /proc/<pid>/io
+- CPU time of the daemon
+
+Synthetic apps exit ``--latency`` seconds after their window gets a
+closewindow. ``--hang`` of them ignore closewindow, ``--stubborn`` ignore
+SIGTERM as well, ``--stopped`` are stopped (SIGSTOP) with the close request
+pending, and ``--zombie`` exit but are never reaped. ``--dialog`` of them
+answer closewindow with a "Save changes?" window that the user answers
+``--answer`` seconds later, and only exit then; "lost" counts those killed
+by a signal first. ``--heavy`` of them write ``--flush`` MiB with fsync
+before exiting, like browsers flushing their profiles, and are listed
+as heavy classes for close waves (``--no-waves`` closes them all at
+once). ``--layers`` adds layer
+shell processes (notifications, OSD, bar, wallpaper) that take
+``--layer-latency`` seconds to exit after SIGTERM; "cut" counts those
+still running when ``dispatch exit`` arrives. Close history
+starts empty unless ``--state`` points at a directory kept across runs.
+
+With ``--resident`` a ``hyprhalt --resident`` is started and warmed up
+first, and the invocation is the thin client handing it the shutdown;
+syscalls and CPU time are then those of the resident daemon.
+
+Needs the daemon's runtime dependencies (PyGObject, dbus-python) but no
+Hyprland session. Only the synthetic processes are ever signalled.
+
+Usage: python benchmarks/shutdown_bench.py [--windows 10,100,1000] [--dry-run]
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+SIGNATURE = "hyprhalt_bench"
+
+
+def flush(path: str, mib: int):
+    """Write and sync mib MiB, in the chunks a profile flush would use."""
+    chunk = os.urandom(1 << 20)
+    with open(path, "wb") as f:
+        for _ in range(mib):
+            f.write(chunk)
+            os.fsync(f.fileno())
+    os.unlink(path)
+
+
+def run_app(latency: float, mode: str, flush_path: str = "", flush_mib: int = 0):
+    """Body of a synthetic app process (runs in a forked child)."""
+
+    def on_close(signum, frame):
+        if mode in ("hang", "stubborn"):
+            return
+        if mode == "heavy":
+            flush(flush_path, flush_mib)
+        time.sleep(latency)
+        os._exit(0)
+
+    def on_term(signum, frame):
+        time.sleep(latency)
+        os._exit(0)
+
+    signal.signal(signal.SIGUSR1, on_close)
+    if mode == "layer":
+        signal.signal(signal.SIGTERM, on_term)
+    else:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN if mode == "stubborn" else signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if mode == "stopped":
+        os.kill(os.getpid(), signal.SIGSTOP)
+    while True:
+        signal.pause()
+
+
+LAYER_NAMESPACES = ("notifications", "osd", "waybar", "wallpaper")
+
+
+class Fleet:
+    """Synthetic app processes, one window each, and layer processes."""
+
+    def __init__(
+        self,
+        count: int,
+        latency: float,
+        hang: int,
+        stubborn: int,
+        zombie: int,
+        stopped: int,
+        dialog: int,
+        heavy: int,
+        flush_mib: int,
+        flush_dir: str,
+        layers: int,
+        layer_latency: float,
+    ):
+        self.windows: dict[str, dict] = {}
+        self.layers: list[dict] = []
+        self.zombies: set[int] = set()
+        self.dialogs: set[int] = set()
+        self.pids: list[int] = []
+
+        for i in range(count):
+            if i < hang:
+                mode = "hang"
+            elif i < hang + stubborn:
+                mode = "stubborn"
+            elif i < hang + stubborn + zombie:
+                mode = "zombie"
+            elif i < hang + stubborn + zombie + stopped:
+                mode = "stopped"
+            elif i < hang + stubborn + zombie + stopped + dialog:
+                mode = "dialog"
+            elif i < hang + stubborn + zombie + stopped + dialog + heavy:
+                mode = "heavy"
+            else:
+                mode = "normal"
+
+            pid = os.fork()
+            if pid == 0:
+                run_app(latency, mode, os.path.join(flush_dir, f"profile-{i}"), flush_mib)
+            self.pids.append(pid)
+            if mode == "zombie":
+                self.zombies.add(pid)
+            elif mode == "dialog":
+                self.dialogs.add(pid)
+
+            address = f"0x{0x1000 + i:x}"
+            self.windows[address] = {
+                "address": address,
+                "pid": pid,
+                "class": f"bench-{mode}-{i % 10}",
+                "title": f"Synthetic app {i}",
+                "xwayland": False,
+            }
+
+        for i in range(layers):
+            pid = os.fork()
+            if pid == 0:
+                run_app(layer_latency, "layer")
+            self.pids.append(pid)
+            self.layers.append(
+                {
+                    "address": f"0x{0x900000 + i:x}",
+                    "namespace": LAYER_NAMESPACES[i % len(LAYER_NAMESPACES)],
+                    "pid": pid,
+                }
+            )
+
+    def running_layers(self) -> int:
+        """Layer processes that haven't exited yet."""
+        running = 0
+        for layer in self.layers:
+            try:
+                info = os.waitid(os.P_PID, layer["pid"], os.WEXITED | os.WNOHANG | os.WNOWAIT)
+            except ChildProcessError:
+                continue
+            running += info is None
+        return running
+
+    def cleanup(self):
+        for pid in self.pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+
+
+class FakeHyprland:
+    """Minimal Hyprland IPC stand-in serving a Fleet."""
+
+    def __init__(self, runtime_dir: str, fleet: Fleet, answer: float):
+        self.fleet = fleet
+        self.answer = answer
+        self.lost: set[int] = set()
+        self.lock = threading.Lock()
+        self.round_trips = 0
+        self.batched_commands = 0
+        self.first_close = None
+        self.exit_time = None
+        self.layers_cut = None
+        self.event_clients: list[socket.socket] = []
+
+        instance_dir = Path(runtime_dir) / "hypr" / SIGNATURE
+        instance_dir.mkdir(parents=True)
+        (instance_dir / "hyprland.lock").write_text(f"{os.getpid()}\n")
+
+        self.server = self._listen(instance_dir / ".socket.sock")
+        self.events = self._listen(instance_dir / ".socket2.sock")
+
+        for target in (self._serve_requests, self._serve_events, self._reap):
+            threading.Thread(target=target, daemon=True).start()
+
+    @staticmethod
+    def _listen(path: Path) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(str(path))
+        sock.listen(64)
+        return sock
+
+    def _serve_requests(self):
+        while True:
+            conn, _ = self.server.accept()
+            with conn:
+                request = self._read_request(conn)
+                self.round_trips += 1
+                conn.sendall(self.handle(request).encode())
+
+    @staticmethod
+    def _read_request(conn: socket.socket) -> str:
+        # Clients don't half-close, so read until the data stops coming
+        data = conn.recv(65536)
+        conn.settimeout(0.005)
+        try:
+            while chunk := conn.recv(65536):
+                data += chunk
+        except socket.timeout:
+            pass
+        conn.settimeout(None)
+        return data.decode()
+
+    def _serve_events(self):
+        while True:
+            conn, _ = self.events.accept()
+            with self.lock:
+                self.event_clients.append(conn)
+
+    def handle(self, request: str) -> str:
+        if request.startswith("[[BATCH]]"):
+            commands = request[len("[[BATCH]]"):].split(";")
+            self.batched_commands += len(commands)
+            return "\n\n\n".join(self.handle(cmd) for cmd in commands)
+
+        if request == "j/clients":
+            with self.lock:
+                return json.dumps(list(self.fleet.windows.values()))
+        if request == "j/layers":
+            levels = {"0": [], "1": [], "2": self.fleet.layers, "3": []}
+            return json.dumps({"BENCH-1": {"levels": levels}})
+        if request.startswith("/dispatch closewindow address:"):
+            address = request.split("address:", 1)[1].strip()
+            if self.first_close is None:
+                self.first_close = time.monotonic()
+            with self.lock:
+                window = self.fleet.windows.get(address)
+            if window and window["pid"] in self.fleet.dialogs:
+                self._open_dialog(window)
+            elif window:
+                os.kill(window["pid"], signal.SIGUSR1)
+            return "ok"
+        if request == "/dispatch exit":
+            self.exit_time = time.monotonic()
+            self.layers_cut = self.fleet.running_layers()
+            return "ok"
+        if request.startswith("/dispatch "):
+            return "ok"
+        return "unknown request"
+
+    def _open_dialog(self, window: dict):
+        """Ask "Save changes?" in a new window, answered after a while."""
+        pid = window["pid"]
+        address = f"0x{0x800000 + pid:x}"
+        with self.lock:
+            if address in self.fleet.windows:
+                return
+            self.fleet.windows[address] = dict(window, address=address, title="Save changes?")
+        self._send_event(f"openwindow>>{address[2:]},1,{window['class']},Save changes?")
+
+        def answer():
+            self._close_window(address)
+            try:
+                os.kill(pid, signal.SIGUSR1)
+            except OSError:
+                pass
+
+        threading.Timer(self.answer, answer).start()
+
+    def _reap(self):
+        """Drop windows of exited apps like Hyprland does on disconnect."""
+        while True:
+            with self.lock:
+                windows = list(self.fleet.windows.values())
+            for window in windows:
+                pid = window["pid"]
+                try:
+                    info = os.waitid(os.P_PID, pid, os.WEXITED | os.WNOHANG | os.WNOWAIT)
+                except ChildProcessError:
+                    info = True
+                if not info:
+                    continue
+                if info is not True and pid in self.fleet.dialogs and info.si_code == os.CLD_KILLED:
+                    self.lost.add(pid)
+                if pid not in self.fleet.zombies:
+                    try:
+                        os.waitpid(pid, 0)
+                    except ChildProcessError:
+                        pass
+                self._close_window(window["address"])
+            time.sleep(0.005)
+
+    def _close_window(self, address: str):
+        with self.lock:
+            if self.fleet.windows.pop(address, None) is None:
+                return
+        self._send_event(f"closewindow>>{address[2:]}")
+
+    def _send_event(self, event: str):
+        with self.lock:
+            clients = list(self.event_clients)
+        for conn in clients:
+            try:
+                conn.sendall(f"{event}\n".encode())
+            except OSError:
+                pass
+
+
+def read_io(pid: int) -> int:
+    """Read plus write syscalls of a process so far."""
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["syscr"]) + int(fields["syscw"])
+    except (IOError, ValueError, KeyError):
+        return -1
+
+
+def run_once(count: int, args) -> dict:
+    runtime_dir = tempfile.mkdtemp(prefix="hyprhalt-bench-")
+    config_dir = Path(runtime_dir) / "config" / "hyprhalt"
+    config_dir.mkdir(parents=True)
+    heavy = [] if args.no_waves else [f"bench-heavy-{i}" for i in range(10)]
+    (config_dir / "config.toml").write_text(
+        f"[timing]\nsigterm_delay = {args.sigterm_delay}\nsigkill_delay = {args.sigkill_delay}\n"
+        f"[waves]\nheavy = {json.dumps(heavy)}\n"
+    )
+
+    # Fork the fleet before any threads exist
+    fleet = Fleet(
+        count,
+        args.latency,
+        args.hang,
+        args.stubborn,
+        args.zombie,
+        args.stopped,
+        args.dialog,
+        args.heavy,
+        args.flush,
+        runtime_dir,
+        args.layers,
+        args.layer_latency,
+    )
+    hyprland = FakeHyprland(runtime_dir, fleet, args.answer)
+
+    env = dict(
+        os.environ,
+        XDG_RUNTIME_DIR=runtime_dir,
+        XDG_CONFIG_HOME=str(Path(runtime_dir) / "config"),
+        XDG_CONFIG_DIRS=str(Path(runtime_dir) / "config"),
+        XDG_STATE_HOME=args.state or str(Path(runtime_dir) / "state"),
+        HYPRLAND_INSTANCE_SIGNATURE=SIGNATURE,
+        PATH="/usr/bin:/bin",  # keep a real quickshell out of the run
+    )
+    cmd = [sys.executable, "-m", "daemon.main", "--no-fork"]
+    if args.dry_run:
+        cmd.append("--dry-run")
+    cmd.extend(args.daemon_args)
+
+    if args.resident:
+        resident = subprocess.Popen(
+            [sys.executable, "-m", "daemon.main", "--resident", *args.daemon_args],
+            cwd=ROOT,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        # Warm means listening with the client list fetched
+        socket_path = Path(runtime_dir) / "hyprhalt.sock"
+        while not socket_path.exists() or hyprland.round_trips == 0:
+            time.sleep(0.01)
+        time.sleep(0.2)
+        hyprland.round_trips = 0
+
+    start = time.monotonic()
+    if args.resident:
+        subprocess.run(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        daemon = resident
+    else:
+        daemon = subprocess.Popen(
+            cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+    syscalls = 0
+    while True:
+        pid, status, rusage = os.wait4(daemon.pid, os.WNOHANG)
+        if pid:
+            break
+        syscalls = max(syscalls, read_io(daemon.pid))
+        time.sleep(0.01)
+    wall = time.monotonic() - start
+
+    fleet.cleanup()
+    return {
+        "windows": count,
+        "first_close": hyprland.first_close - start if hyprland.first_close else None,
+        "wall": wall,
+        "exit_dispatch": hyprland.exit_time - start if hyprland.exit_time else None,
+        "round_trips": hyprland.round_trips,
+        "batched": hyprland.batched_commands,
+        "syscalls": syscalls,
+        "cpu": rusage.ru_utime + rusage.ru_stime,
+        "layers_cut": hyprland.layers_cut,
+        "lost": len(hyprland.lost),
+        "status": os.waitstatus_to_exitcode(status),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--windows", default="10,100,1000", help="Comma-separated fleet sizes")
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds an app takes to close")
+    parser.add_argument("--hang", type=int, default=0, help="Apps that ignore closewindow")
+    parser.add_argument("--stubborn", type=int, default=0, help="Apps that also ignore SIGTERM")
+    parser.add_argument("--zombie", type=int, default=0, help="Apps that are never reaped")
+    parser.add_argument("--stopped", type=int, default=0, help="Apps that are stopped")
+    parser.add_argument("--dialog", type=int, default=0, help="Apps that ask before closing")
+    parser.add_argument(
+        "--answer", type=float, default=3.0, help="Seconds the user takes to answer a dialog"
+    )
+    parser.add_argument("--heavy", type=int, default=0, help="Apps that flush to disk on close")
+    parser.add_argument("--flush", type=int, default=64, help="MiB a heavy app writes")
+    parser.add_argument(
+        "--no-waves", action="store_true", help="Don't mark heavy apps, close all at once"
+    )
+    parser.add_argument("--layers", type=int, default=0, help="Layer shell processes")
+    parser.add_argument(
+        "--layer-latency", type=float, default=0.3, help="Seconds a layer takes to exit"
+    )
+    parser.add_argument("--sigterm-delay", type=int, default=2)
+    parser.add_argument("--sigkill-delay", type=int, default=4)
+    parser.add_argument("--dry-run", action="store_true", help="Run the daemon with --dry-run")
+    parser.add_argument("--state", help="Keep the daemon's close history in this directory")
+    parser.add_argument(
+        "--resident", action="store_true", help="Trigger a warm resident daemon instead"
+    )
+    parser.add_argument("daemon_args", nargs="*", help="Extra daemon arguments (after --)")
+    args = parser.parse_args()
+    if args.resident and args.dry_run:
+        parser.error("a resident daemon only exits after a real shutdown, drop --dry-run")
+
+    print(
+        f"{'windows':>8} {'close ms':>9} {'wall s':>8} {'exit s':>8} {'IPC':>6} {'batched':>8} "
+        f"{'rw sys':>8} {'rw/500ms':>9} {'CPU s':>7} {'cut':>4} {'lost':>5} {'rc':>3}"
+    )
+    for count in (int(n) for n in args.windows.split(",")):
+        r = run_once(count, args)
+        exit_dispatch = f"{r['exit_dispatch']:8.3f}" if r["exit_dispatch"] else f"{'-':>8}"
+        first_close = f"{r['first_close'] * 1000:9.1f}" if r["first_close"] else f"{'-':>9}"
+        per_tick = r["syscalls"] / max(r["wall"] / 0.5, 1)
+        cut = "-" if r["layers_cut"] is None else r["layers_cut"]
+        print(
+            f"{r['windows']:>8} {first_close} {r['wall']:8.3f} {exit_dispatch} {r['round_trips']:>6} "
+            f"{r['batched']:>8} {r['syscalls']:>8} {per_tick:9.1f} {r['cpu']:7.3f} {cut:>4} "
+            f"{r['lost']:>5} {r['status']:>3}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,3 @@
 """Hyprhalt daemon package."""
+
+__version__ = "0.2.2"
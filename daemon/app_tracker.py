@@ -2,16 +2,16 @@
 
 import os
 import signal
-from dataclasses import dataclass
-from pathlib import Path
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Container, Optional, ValuesView
 
-from . import hyprland_ipc
+from . import cgroup, hyprland_ipc
+from .procfs import DEAD_STATES, ProcRecord, ProcSnapshot, read_stat
 
 
-@dataclass
+@dataclass(slots=True)
 class App:
-    """Represents an application to be closed."""
+    """A window (or windowless process) to be closed, as listed in the UI."""
 
     address: Optional[str]
     pid: int
@@ -20,16 +20,150 @@ class App:
     is_xwayland: bool
     is_layer: bool
     status: str = "alive"
+    # The owning process, set by AppRegistry.add()
+    process: Optional["Process"] = field(default=None, repr=False, compare=False)
 
     def should_close_via_ipc(self) -> bool:
         """Check if app should be closed via Hyprland IPC."""
         return self.address is not None and not self.is_layer
 
+    def quit(self):
+        """Attempt graceful close."""
+        if self.should_close_via_ipc():
+            success = hyprland_ipc.close_window(self.address)
+            if success:
+                self.status = "closing"
+        # For layers and children without addresses, don't send SIGTERM yet
+        # They will be handled by check_windowless_pids() or escalation
+
+
+class Process:
+    """A tracked process and the apps (windows) it owns.
+
+    Liveness probes, signals and escalation deadlines are per process, so
+    an app with several windows is probed and signalled once.
+    """
+
+    __slots__ = (
+        "pid",
+        "apps",
+        "descendants",
+        "exited",
+        "cgroup",
+        "grace",
+        "sigterm_delay",
+        "sigkill_delay",
+        "sigterm_sent",
+        "sigkill_sent",
+        "policy",
+        "windowless_since",
+        "windowless_termed",
+        "continued",
+        "blocked",
+        "dialogs",
+        "paused_at",
+        "awaited",
+        "queued",
+        "timeline_start",
+    )
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.apps: list[App] = []
+        # Helper processes forked by the app, as pid -> start time so a
+        # reused PID is never mistaken for one of them
+        self.descendants: dict[int, int] = {}
+        self.exited = False
+        # Per-app systemd unit cgroup, when the app can be killed as a group
+        self.cgroup: Optional[str] = None
+        # Escalation timeline in seconds since shutdown start, from the
+        # matching [[rules]] entry or [timing]
+        self.grace = 0.0
+        self.sigterm_delay = 0.0
+        self.sigkill_delay = 0.0
+        self.sigterm_sent = False
+        self.sigkill_sent = False
+        # Where the timeline came from: "default", "rule" or "learned"
+        self.policy = "default"
+        self.windowless_since: Optional[float] = None
+        self.windowless_termed = False
+        # Sent SIGCONT after being found stopped
+        self.continued = False
+        # Last seen in uninterruptible sleep (D state)
+        self.blocked = False
+        # Windows opened after the close request, most likely a "Save
+        # changes?" dialog; escalation is paused since paused_at (seconds
+        # since shutdown start) while one is open, for awaited in total
+        self.dialogs: set[str] = set()
+        self.paused_at: Optional[float] = None
+        self.awaited = 0.0
+        # Waiting for a later close wave; the timeline starts once released,
+        # at timeline_start seconds since shutdown start
+        self.queued = False
+        self.timeline_start = 0.0
+
+    @property
+    def app(self) -> App:
+        """The first app of the process, which names it in logs and traces."""
+        return self.apps[0]
+
+    @property
+    def awaiting_user(self) -> bool:
+        """Whether escalation waits for the user to answer a dialog."""
+        return self.paused_at is not None
+
+    @property
+    def timeline_shift(self) -> float:
+        """Seconds the escalation deadlines were moved back by waves and dialogs."""
+        return self.timeline_start + self.awaited
+
+    def has_window(self) -> bool:
+        return any(app.address for app in self.apps)
+
+    def set_status(self, status: str):
+        for app in self.apps:
+            app.status = status
+
+    def track_descendants(self, snapshot: ProcSnapshot, prune: Container[int] = ()):
+        """Add the process's current tree from a /proc snapshot.
+
+        The walk stops at PIDs in prune, which must hold hyprhalt itself
+        (its overlay isn't the app's helper) and the other tracked apps
+        (they follow their own timeline).
+        """
+        for record in snapshot.descendants(self.pid, prune):
+            self.descendants[record.pid] = record.starttime
+
+    def live_descendants(self) -> list[int]:
+        """Return tracked descendants that are still running."""
+        alive = []
+        for pid, starttime in list(self.descendants.items()):
+            record = read_stat(pid)
+            if record and record.starttime == starttime and record.state not in DEAD_STATES:
+                alive.append(pid)
+            else:
+                del self.descendants[pid]
+        return alive
+
     def is_alive(self) -> bool:
-        """Check if process is still alive."""
+        """Check if the process or any of its descendants is still alive."""
+        if not self.exited and self.process_alive():
+            return True
+        return bool(self.live_descendants())
+
+    def process_alive(self) -> bool:
+        """Check if the process itself is still alive.
+
+        A zombie still answers kill(pid, 0), so the state in /proc decides.
+        """
         if self.pid <= 0:
             return False
 
+        record = self.stat()
+        if record:
+            return record.state not in DEAD_STATES
+
+        # Gone, or /proc can't be read
         try:
             os.kill(self.pid, 0)
             return True
@@ -38,45 +172,149 @@ class App:
                 return True
             return False
 
-    def quit(self):
-        """Attempt graceful close."""
-        if self.should_close_via_ipc():
-            success = hyprland_ipc.close_window(self.address)
-            if success:
-                self.status = "closing"
-        # For layers and children without addresses, don't send SIGTERM yet
-        # They will be handled by check_windowless_pids() or escalation
+    def stat(self) -> Optional[ProcRecord]:
+        """Read the process's /proc stat record, None if it is gone."""
+        return read_stat(self.pid) if self.pid > 0 else None
 
-    def kill(self):
-        """Force kill with SIGKILL."""
-        if self.pid > 0:
+    def signal_tree(self, sig: int) -> bool:
+        """Signal the process and all live descendants in one sweep.
+
+        Returns True if at least one process received the signal.
+        """
+        if self.cgroup:
+            pids = cgroup.get_pids(self.cgroup)
+        else:
+            pids = self.live_descendants()
+            if self.pid > 0 and not self.exited:
+                pids.insert(0, self.pid)
+
+        delivered = False
+        for pid in pids:
             try:
-                os.kill(self.pid, signal.SIGKILL)
-                self.status = "killed"
+                os.kill(pid, sig)
+                delivered = True
             except OSError:
                 pass
+        return delivered
 
+    def terminate(self):
+        """Send SIGTERM to the whole process tree."""
+        self.signal_tree(signal.SIGTERM)
 
-def get_all_apps() -> tuple[list[App], list[App]]:
-    """Get all apps, separated into windows and layers."""
+    def kill(self):
+        """Force kill the whole process tree with SIGKILL."""
+        if (self.cgroup and cgroup.kill(self.cgroup)) or self.signal_tree(signal.SIGKILL):
+            self.set_status("killed")
+
+
+class AppRegistry:
+    """Tracked apps, grouped by process and indexed by PID, address and class.
+
+    Iterating the registry yields apps (one per window) in the order they
+    were added; processes() lists each owning process once. by_address
+    only holds windows that are still open: those of the apps, and
+    windows a tracked process opened later (add_window()).
+
+    Apps and processes are kept in insertion-ordered dicts keyed by id(),
+    so removing one doesn't scan the others.
+    """
+
+    def __init__(self, own_pid: int):
+        self.own_pid = own_pid
+        self.by_pid: dict[int, Process] = {}
+        self.by_address: dict[str, App] = {}
+        self.by_class: dict[str, dict[int, App]] = {}
+        self._apps: dict[int, App] = {}
+        # Windows opened after discovery, per owning PID
+        self._added_windows: dict[int, list[str]] = {}
+        # Processes in the order they were added, including PID-less ones
+        self._processes: dict[int, Process] = {}
+
+    def __iter__(self):
+        return iter(self._apps.values())
+
+    def __len__(self) -> int:
+        return len(self._apps)
+
+    def processes(self) -> ValuesView[Process]:
+        return self._processes.values()
+
+    def add(self, app: App) -> Optional[Process]:
+        """Track an app under its process.
+
+        Returns the process if it is new, None if the app joined a known
+        process or was not added at all: hyprhalt itself, and windowless
+        entries for a process already tracked through its windows.
+        """
+        if app.pid == self.own_pid:
+            return None
+
+        process = self.by_pid.get(app.pid) if app.pid > 0 else None
+        if process and app.address is None:
+            return None
+
+        created = process is None
+        if created:
+            process = Process(app.pid)
+            self._processes[id(process)] = process
+            if app.pid > 0:
+                self.by_pid[app.pid] = process
+
+        app.process = process
+        process.apps.append(app)
+        self._apps[id(app)] = app
+        if app.address:
+            self.by_address[app.address] = app
+        self.by_class.setdefault(app.class_name, {})[id(app)] = app
+        return process if created else None
+
+    def add_window(self, address: str, process: Process):
+        """Index a window a tracked process opened, under its first app."""
+        self.by_address[address] = process.app
+        self._added_windows.setdefault(process.pid, []).append(address)
+
+    def remove_window(self, address: str) -> Optional[App]:
+        """Forget a closed window. Returns the app it belonged to."""
+        return self.by_address.pop(address, None)
+
+    def remove_process(self, process: Process):
+        """Stop tracking a process and all of its apps."""
+        del self._processes[id(process)]
+        if self.by_pid.get(process.pid) is process:
+            del self.by_pid[process.pid]
+            for address in self._added_windows.pop(process.pid, ()):
+                self.by_address.pop(address, None)
+
+        for app in process.apps:
+            del self._apps[id(app)]
+            if app.address:
+                self.by_address.pop(app.address, None)
+            same_class = self.by_class.get(app.class_name)
+            if same_class:
+                del same_class[id(app)]
+                if not same_class:
+                    del self.by_class[app.class_name]
+
+
+def apps_from_clients(clients: list[hyprland_ipc.ClientInfo]) -> list[App]:
+    """Build window apps from get_client_fields() results."""
     windows = []
-    layers = []
-
-    # Get client windows
-    clients = hyprland_ipc.get_clients()
     for client in clients:
         app = App(
-            address=client.get("address"),
-            pid=client.get("pid", -1),
-            class_name=client.get("class", "unknown"),
+            address=client.address,
+            pid=client.pid,
+            class_name=client.class_name,
             namespace=None,
-            is_xwayland=client.get("xwayland", False),
+            is_xwayland=client.xwayland,
             is_layer=False,
         )
         windows.append(app)
+    return windows
+
 
-    # Get layer shells
-    layer_data = hyprland_ipc.get_layers()
+def apps_from_layers(layer_data: list[dict]) -> list[App]:
+    """Build layer apps from a flattened j/layers response."""
+    layers = []
     for layer in layer_data:
         app = App(
             address=layer.get("address"),
@@ -87,78 +325,27 @@ def get_all_apps() -> tuple[list[App], list[App]]:
             is_layer=True,
         )
         layers.append(app)
+    return layers
 
-    # Get Hyprland children
-    hyprland_pid = hyprland_ipc.get_hyprland_pid()
-    if hyprland_pid:
-        children = get_hyprland_children(hyprland_pid)
-        windows.extend(children)
-
-    return windows, layers
 
-
-def get_hyprland_children(parent_pid: int) -> list[App]:
+def get_hyprland_children(parent_pid: int, snapshot: ProcSnapshot) -> list[App]:
     """Get all child processes of Hyprland."""
     children = []
 
-    try:
-        for pid_dir in Path("/proc").iterdir():
-            if not pid_dir.name.isdigit():
-                continue
-
-            pid = int(pid_dir.name)
-            stat_file = pid_dir / "stat"
-
-            if not stat_file.exists():
-                continue
+    for record in snapshot.children_of(parent_pid):
+        # Skip Xwayland
+        if record.comm == "Xwayland":
+            continue
 
-            try:
-                with open(stat_file) as f:
-                    stat = f.read()
-                    # Parse stat file: pid (comm) state ppid ...
-                    parts = stat.split(")")
-                    if len(parts) < 2:
-                        continue
-
-                    fields = parts[1].strip().split()
-                    if len(fields) < 2:
-                        continue
-
-                    ppid = int(fields[1])
-                    if ppid != parent_pid:
-                        continue
-
-                    # Get process name
-                    comm_file = pid_dir / "comm"
-                    if comm_file.exists():
-                        with open(comm_file) as cf:
-                            name = cf.read().strip()
-                    else:
-                        name = "unknown"
-
-                    # Skip Xwayland
-                    if name == "Xwayland":
-                        continue
-
-                    app = App(
-                        address=None,
-                        pid=pid,
-                        class_name=name,
-                        namespace=None,
-                        is_xwayland=False,
-                        is_layer=False,
-                    )
-                    children.append(app)
-
-            except (IOError, ValueError):
-                continue
-
-    except IOError:
-        pass
+        app = App(
+            address=None,
+            pid=record.pid,
+            class_name=record.comm,
+            namespace=None,
+            is_xwayland=False,
+            is_layer=False,
+        )
+        children.append(app)
 
     return children
 
-
-def filter_own_process(apps: list[App], own_pid: int) -> list[App]:
-    """Remove hyprhalt daemon from app list."""
-    return [app for app in apps if app.pid != own_pid]
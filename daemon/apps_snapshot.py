@@ -0,0 +1,50 @@
+"""Versioned, atomically written app list snapshots."""
+
+import json
+import os
+from typing import Optional
+
+
+class AppsSnapshot:
+    """Writes the app list to a JSON file only when it changes.
+
+    Each write goes to a temporary file that is renamed over the target,
+    so readers never see a half-written file. ``generation`` increases by
+    one per write, letting readers tell cheaply whether anything is new.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.generation = 0
+        self._last: Optional[bytes] = None
+
+    def update(self, apps: list[dict]) -> bool:
+        """Write apps if they differ from the last write. Returns True if written."""
+        data = json.dumps(apps).encode()
+        if data == self._last:
+            return False
+
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        self._last = data
+        self.generation += 1
+        return True
+
+    def remove(self):
+        """Delete the snapshot file."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        # The next update() must write again, even with the same apps
+        self._last = None
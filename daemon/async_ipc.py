@@ -0,0 +1,195 @@
+"""Non-blocking Hyprland IPC requests on the GLib main loop.
+
+hyprland_ipc.send_command() blocks for up to its socket timeout, which
+freezes escalation deadlines, D-Bus calls and UI updates while the
+compositor is slow. AsyncIPC sends the same requests through IO watches
+instead and reports replies to callbacks, with a deadline per request.
+
+Requests for the same command are coalesced: callers asking before the
+in-flight request is written share it, later callers share a single
+follow-up request sent once it completes. So there is at most one
+``j/clients`` in flight, and every reply is at least as new as the call
+that asked for it.
+"""
+
+import logging
+import socket
+from typing import Callable, Optional
+
+from gi.repository import GLib
+
+from . import hyprland_ipc, trace
+
+logger = logging.getLogger("hyprhalt")
+
+# Seconds a request may take before its callbacks get None
+REQUEST_TIMEOUT = 2.0
+
+Callback = Callable[[Optional[bytearray]], None]
+
+
+class Request:
+    """One request to the command socket, shared by all callers of a command."""
+
+    def __init__(self, client: "AsyncIPC", cmd: str):
+        self.client = client
+        self.cmd = cmd
+        self.callbacks: list[Callback] = []
+        self.sent = False
+        self._payload = memoryview(cmd.encode())
+        self._buffer = bytearray(hyprland_ipc.RECV_BUFFER_SIZE)
+        self._size = 0
+        self._sock: Optional[socket.socket] = None
+        self._source = None
+        self._timer = None
+        self._span = None
+
+    def start(self):
+        """Connect and wait for the socket to accept the command."""
+        self._span = trace.span("ipc", "ipc", cmd=self.cmd[:80], nonblocking=True)
+        self._span.__enter__()
+        self._timer = GLib.timeout_add(int(self.client.timeout * 1000), self._on_timeout)
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.setblocking(False)
+        try:
+            # Connecting to a UNIX socket completes or fails right away
+            self._sock.connect(hyprland_ipc.get_socket_path())
+        except (OSError, RuntimeError) as e:
+            # Report from the loop, never from inside request()
+            GLib.idle_add(self._fail, e)
+            return
+        self._watch(GLib.IO_OUT, self._on_writable)
+
+    def cancel(self, callback: Optional[Callback] = None):
+        """Drop a caller's callback (default: all); abort once none are left."""
+        if callback is None:
+            self.callbacks.clear()
+        elif callback in self.callbacks:
+            self.callbacks.remove(callback)
+        if not self.callbacks:
+            self._finish(None)
+
+    def _watch(self, condition, handler):
+        self._source = GLib.io_add_watch(
+            self._sock.fileno(),
+            GLib.PRIORITY_DEFAULT,
+            condition | GLib.IO_HUP | GLib.IO_ERR,
+            handler,
+        )
+
+    def _on_writable(self, fd, condition):
+        try:
+            self._payload = self._payload[self._sock.send(self._payload) :]
+        except BlockingIOError:
+            return True
+        except OSError as e:
+            self._source = None
+            self._fail(e)
+            return False
+
+        if self._payload:
+            return True
+        self.sent = True
+        self._watch(GLib.IO_IN, self._on_readable)
+        return False
+
+    def _on_readable(self, fd, condition):
+        while True:
+            if self._size == len(self._buffer):
+                self._buffer.extend(bytes(len(self._buffer)))
+            try:
+                with memoryview(self._buffer) as view:
+                    received = self._sock.recv_into(view[self._size :])
+            except BlockingIOError:
+                return True
+            except OSError as e:
+                self._source = None
+                self._fail(e)
+                return False
+            if not received:
+                break
+            self._size += received
+
+        self._source = None
+        del self._buffer[self._size :]
+        self._finish(self._buffer)
+        return False
+
+    def _on_timeout(self):
+        self._timer = None
+        logger.debug(f"IPC request {self.cmd!r} timed out after {self.client.timeout}s")
+        self._finish(None)
+        return False
+
+    def _fail(self, error: Exception):
+        logger.debug(f"IPC request {self.cmd!r} failed: {error}")
+        self._finish(None)
+        return False
+
+    def _finish(self, reply: Optional[bytearray]):
+        """Release the socket and hand the reply (None on failure) to every caller."""
+        if self._source:
+            GLib.source_remove(self._source)
+            self._source = None
+        if self._timer:
+            GLib.source_remove(self._timer)
+            self._timer = None
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+            self._span.__exit__(None, None, None)
+
+        callbacks, self.callbacks = self.callbacks, []
+        self.client._done(self)
+        for callback in callbacks:
+            callback(reply)
+
+
+class AsyncIPC:
+    """Coalescing, non-blocking client for Hyprland's command socket."""
+
+    def __init__(self, timeout: float = REQUEST_TIMEOUT):
+        self.timeout = timeout
+        # Per command: the request in flight and the one queued behind it
+        self._current: dict[str, Request] = {}
+        self._next: dict[str, Request] = {}
+
+    def request(self, cmd: str, callback: Callback) -> Request:
+        """Ask for cmd's reply, passed to callback from the main loop.
+
+        The callback gets None if the request failed or timed out, and is
+        not called at all once cancelled. Returns the request, whose
+        cancel() drops the callback again.
+        """
+        current = self._current.get(cmd)
+        if current is None:
+            request = self._current[cmd] = Request(self, cmd)
+            request.start()
+        elif not current.sent:
+            request = current
+        else:
+            request = self._next.get(cmd)
+            if request is None:
+                request = self._next[cmd] = Request(self, cmd)
+        request.callbacks.append(callback)
+        return request
+
+    def close(self):
+        """Cancel every pending request without calling back."""
+        for request in [*self._next.values(), *self._current.values()]:
+            request.cancel()
+
+    def _done(self, request: Request):
+        """Forget a finished request and send the one queued behind it."""
+        if self._next.get(request.cmd) is request:
+            del self._next[request.cmd]
+            return
+        if self._current.get(request.cmd) is not request:
+            return
+
+        del self._current[request.cmd]
+        queued = self._next.pop(request.cmd, None)
+        if queued:
+            self._current[request.cmd] = queued
+            queued.start()
@@ -0,0 +1,91 @@
+"""cgroup v2 helpers for apps launched in their own systemd units."""
+
+import logging
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger("hyprhalt")
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def is_available() -> bool:
+    """Check for a unified (v2) cgroup hierarchy."""
+    return (CGROUP_ROOT / "cgroup.controllers").exists()
+
+
+def get_cgroup(pid: int) -> Optional[str]:
+    """Get the v2 cgroup path of a process, relative to the hierarchy root."""
+    try:
+        with open(f"/proc/{pid}/cgroup") as f:
+            for line in f:
+                if line.startswith("0::"):
+                    return line[3:].strip()
+    except (IOError, ValueError):
+        pass
+    return None
+
+
+def is_app_unit(path: str) -> bool:
+    """Check if a cgroup belongs to a per-app unit (app-*.scope/service)."""
+    name = path.rsplit("/", 1)[-1]
+    return name.startswith("app-") and name.endswith((".scope", ".service"))
+
+
+def find_app_cgroup(pid: int, protected: list[str]) -> Optional[str]:
+    """Get the app unit cgroup of a PID if it is safe to kill as a whole.
+
+    A cgroup is unsafe if any protected cgroup (our own, Hyprland's) is the
+    same group or nested inside it.
+    """
+    path = get_cgroup(pid)
+    if not path or not is_app_unit(path):
+        return None
+
+    for other in protected:
+        if other == path or other.startswith(path + "/"):
+            return None
+
+    return path
+
+
+def events_file(path: str) -> str:
+    """Get the cgroup.events file of a cgroup."""
+    return str(CGROUP_ROOT / path.lstrip("/") / "cgroup.events")
+
+
+def is_populated(path: str) -> bool:
+    """Check if any process is left in a cgroup or its children."""
+    try:
+        with open(events_file(path)) as f:
+            for line in f:
+                key, _, value = line.partition(" ")
+                if key == "populated":
+                    return value.strip() == "1"
+    except (IOError, ValueError):
+        # Removed cgroups are empty
+        return False
+    return False
+
+
+def get_pids(path: str) -> list[int]:
+    """List the processes directly in a cgroup."""
+    try:
+        with open(CGROUP_ROOT / path.lstrip("/") / "cgroup.procs") as f:
+            return [int(line) for line in f if line.strip()]
+    except (IOError, ValueError):
+        return []
+
+
+def kill(path: str) -> bool:
+    """SIGKILL every process in a cgroup with one write to cgroup.kill.
+
+    Returns False if the kernel lacks cgroup.kill (before 5.14).
+    """
+    try:
+        with open(CGROUP_ROOT / path.lstrip("/") / "cgroup.kill", "w") as f:
+            f.write("1")
+        return True
+    except OSError as e:
+        logger.debug(f"cgroup.kill failed for {path}: {e}")
+        return False
@@ -0,0 +1,55 @@
+"""Thin client for a resident hyprhalt (``hyprhalt --resident``).
+
+Only uses the standard library, so handing a shutdown to a warm daemon
+costs little more than starting the interpreter.
+"""
+
+import json
+import os
+import socket
+from typing import Optional
+
+# Seconds to wait for the resident daemon to confirm the shutdown started
+REQUEST_TIMEOUT = 5.0
+
+
+def get_socket_path() -> str:
+    """Get the resident daemon's request socket path."""
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR", f"/run/user/{os.getuid()}")
+    return f"{runtime_dir}/hyprhalt.sock"
+
+
+def request_shutdown(args, started: float) -> Optional[dict]:
+    """Ask a resident daemon to start a shutdown.
+
+    ``started`` is the time.monotonic() timestamp of the invocation, which
+    the daemon uses for its latency logs and traces. Returns the daemon's
+    reply, or None if no resident daemon is listening.
+    """
+    request = {
+        "post_cmd": args.post_cmd,
+        "vt": args.vt,
+        "text": args.text,
+        "dry_run": args.dry_run,
+        "no_exit": args.no_exit,
+        "trace": args.trace,
+        "started": started,
+    }
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(REQUEST_TIMEOUT)
+    try:
+        sock.connect(get_socket_path())
+    except OSError:
+        sock.close()
+        return None
+
+    # Connected, so the daemon owns this shutdown from here on
+    try:
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        reply = sock.makefile("rb").readline()
+        return json.loads(reply) if reply else {"ok": False, "error": "no reply"}
+    except (OSError, ValueError) as e:
+        return {"ok": False, "error": str(e)}
+    finally:
+        sock.close()
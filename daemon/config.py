@@ -2,8 +2,9 @@
 
 import logging
 import os
+import re
 from pathlib import Path
-from typing import NamedTuple
+from typing import NamedTuple, Optional
 
 try:
     import tomllib
@@ -16,6 +17,10 @@ logger = logging.getLogger("hyprhalt")
 class TimingConfig(NamedTuple):
     sigterm_delay: int = 8
     sigkill_delay: int = 15
+    adaptive: bool = True
+    # Seconds an app's escalation may stay paused while it shows a close
+    # dialog ("Save changes?"), 0 to never wait for the user
+    dialog_timeout: float = 60.0
 
 
 class ColorConfig(NamedTuple):
@@ -35,10 +40,145 @@ class UIConfig(NamedTuple):
     modal_border_radius: int = 10
 
 
+# Layer namespaces of the wallpaper, bars and the hyprhalt overlay itself
+DEFAULT_KEEP_LAYERS = ("hyprhalt", "wallpaper", "hyprpaper", "swww-daemon", "mpvpaper", "waybar")
+
+
+class LayersConfig(NamedTuple):
+    # Namespaces whose processes stay up until Hyprland exits
+    keep: tuple[str, ...] = DEFAULT_KEEP_LAYERS
+    # Stop the other layers while windows are still closing, instead of
+    # only once the shutdown can no longer be cancelled
+    stop_early: bool = False
+    # Seconds to wait for stopped layer processes before exiting Hyprland
+    exit_timeout: float = 1.0
+
+
+# Window classes that write a lot to disk while closing (browser
+# profiles, IDE indexes, mail stores)
+DEFAULT_HEAVY_CLASSES = (
+    "firefox",
+    "librewolf",
+    "chromium",
+    "google-chrome",
+    "brave-browser",
+    "thunderbird",
+    "code",
+    "code-oss",
+    "jetbrains-idea",
+)
+
+
+class WavesConfig(NamedTuple):
+    # Window classes closed in waves paced by IO and memory pressure
+    heavy: tuple[str, ...] = DEFAULT_HEAVY_CLASSES
+    # Heavy apps closing at once to start with, adapted to pressure after
+    concurrency: int = 2
+    # Stall percentage (PSI "full") above which fewer heavy apps close at once
+    pressure_limit: float = 60.0
+    # Seconds between pressure samples
+    interval: float = 0.25
+
+
+class RuleConfig(NamedTuple):
+    """A [[rules]] entry: which apps it matches and how to treat them."""
+
+    class_name: Optional[str] = None
+    comm: Optional[str] = None
+    xwayland: Optional[bool] = None
+    regex: bool = False
+    action: Optional[str] = None  # "skip" or "kill"
+    grace: Optional[float] = None
+    sigterm_delay: Optional[float] = None
+    sigkill_delay: Optional[float] = None
+
+
+RULE_ACTIONS = ("skip", "kill")
+# Rule fields matched against strings
+RULE_MATCHERS = ("class_name", "comm")
+
+
+class RuleIndex:
+    """Rules compiled for fast lookup.
+
+    Rules with an exact string matcher are indexed by (field, value) so a
+    lookup only checks the few rules that can apply; regex and
+    xwayland-only rules are tried in order. The first matching rule in
+    config order wins.
+    """
+
+    def __init__(self, rules: tuple[RuleConfig, ...] = ()):
+        self.rules = rules
+        self._exact: dict[tuple[str, str], list[int]] = {}
+        self._fallback: list[int] = []
+        self._patterns: dict[int, dict[str, re.Pattern]] = {}
+        self.needs_comm = any(rule.comm is not None for rule in rules)
+
+        for i, rule in enumerate(rules):
+            if rule.regex:
+                try:
+                    self._patterns[i] = {
+                        field: re.compile(getattr(rule, field))
+                        for field in RULE_MATCHERS
+                        if getattr(rule, field) is not None
+                    }
+                except re.error as e:
+                    raise ValueError(f"Invalid regex in rule {i + 1}: {e}")
+                self._fallback.append(i)
+                continue
+
+            for field in RULE_MATCHERS:
+                value = getattr(rule, field)
+                if value is not None:
+                    self._exact.setdefault((field, value), []).append(i)
+                    break
+            else:
+                self._fallback.append(i)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def match(self, values: dict[str, Optional[str]], xwayland: bool) -> Optional[RuleConfig]:
+        """Find the first rule matching an app's class/comm values."""
+        candidates = list(self._fallback)
+        for field in RULE_MATCHERS:
+            value = values.get(field)
+            if value is not None:
+                candidates.extend(self._exact.get((field, value), ()))
+
+        for i in sorted(candidates):
+            if self._matches(i, values, xwayland):
+                return self.rules[i]
+        return None
+
+    def _matches(self, i: int, values: dict[str, Optional[str]], xwayland: bool) -> bool:
+        rule = self.rules[i]
+        if rule.xwayland is not None and rule.xwayland != xwayland:
+            return False
+
+        patterns = self._patterns.get(i)
+        for field in RULE_MATCHERS:
+            expected = getattr(rule, field)
+            if expected is None:
+                continue
+            value = values.get(field)
+            if value is None:
+                return False
+            if patterns is not None:
+                if not patterns[field].fullmatch(value):
+                    return False
+            elif value != expected:
+                return False
+        return True
+
+
 class Config(NamedTuple):
     timing: TimingConfig = TimingConfig()
     colors: ColorConfig = ColorConfig()
     ui: UIConfig = UIConfig()
+    layers: LayersConfig = LayersConfig()
+    waves: WavesConfig = WavesConfig()
+    rules: RuleIndex = RuleIndex()
 
 
 def hex_to_rgb(hex_color: str) -> str:
@@ -64,6 +204,10 @@ def validate_config(config: Config) -> None:
         raise ValueError(
             f"sigkill_delay ({config.timing.sigkill_delay}) must be >= sigterm_delay ({config.timing.sigterm_delay})"
         )
+    if not isinstance(config.timing.adaptive, bool):
+        raise ValueError(f"adaptive must be true or false, got {config.timing.adaptive}")
+    if config.timing.dialog_timeout < 0:
+        raise ValueError(f"dialog_timeout must be non-negative, got {config.timing.dialog_timeout}")
     
     # Validate colors
     if not (0 <= config.colors.backdrop_opacity <= 1):
@@ -75,6 +219,43 @@ def validate_config(config: Config) -> None:
     if config.ui.modal_border_radius < 0:
         raise ValueError(f"modal_border_radius must be non-negative, got {config.ui.modal_border_radius}")
 
+    # Validate layers
+    if not all(isinstance(namespace, str) for namespace in config.layers.keep):
+        raise ValueError(f"layers keep must be a list of namespaces, got {list(config.layers.keep)}")
+    if not isinstance(config.layers.stop_early, bool):
+        raise ValueError(f"stop_early must be true or false, got {config.layers.stop_early}")
+    if config.layers.exit_timeout < 0:
+        raise ValueError(f"exit_timeout must be non-negative, got {config.layers.exit_timeout}")
+
+    # Validate close waves
+    if not all(isinstance(name, str) for name in config.waves.heavy):
+        raise ValueError(f"waves heavy must be a list of classes, got {list(config.waves.heavy)}")
+    if config.waves.concurrency < 1:
+        raise ValueError(f"concurrency must be at least 1, got {config.waves.concurrency}")
+    if not (0 < config.waves.pressure_limit <= 100):
+        raise ValueError(f"pressure_limit must be between 0 and 100, got {config.waves.pressure_limit}")
+    if config.waves.interval <= 0:
+        raise ValueError(f"interval must be positive, got {config.waves.interval}")
+
+    # Validate rules
+    for i, rule in enumerate(config.rules.rules, 1):
+        if all(getattr(rule, field) is None for field in RULE_MATCHERS) and rule.xwayland is None:
+            raise ValueError(f"rule {i} must match on class, comm or xwayland")
+        if rule.action is not None and rule.action not in RULE_ACTIONS:
+            raise ValueError(f"rule {i}: action must be one of {', '.join(RULE_ACTIONS)}, got {rule.action}")
+        for key in ("grace", "sigterm_delay", "sigkill_delay"):
+            value = getattr(rule, key)
+            if value is not None and value < 0:
+                raise ValueError(f"rule {i}: {key} must be non-negative, got {value}")
+        if (
+            rule.sigterm_delay is not None
+            and rule.sigkill_delay is not None
+            and rule.sigkill_delay < rule.sigterm_delay
+        ):
+            raise ValueError(
+                f"rule {i}: sigkill_delay ({rule.sigkill_delay}) must be >= sigterm_delay ({rule.sigterm_delay})"
+            )
+
 
 def load_config() -> Config:
     """Load configuration from XDG config directories."""
@@ -114,6 +295,8 @@ def load_config() -> Config:
         timing = TimingConfig(
             sigterm_delay=timing_data.get("sigterm_delay", 8),
             sigkill_delay=timing_data.get("sigkill_delay", 15),
+            adaptive=timing_data.get("adaptive", True),
+            dialog_timeout=timing_data.get("dialog_timeout", 60.0),
         )
 
         # Parse colors (convert hex to RGB if needed)
@@ -169,7 +352,46 @@ def load_config() -> Config:
             modal_border_radius=ui_data.get("modal_border_radius", 10),
         )
 
-        config = Config(timing=timing, colors=colors, ui=ui)
+        # Parse layer teardown
+        layers_data = data.get("layers", {})
+        layers = LayersConfig(
+            keep=tuple(layers_data.get("keep", DEFAULT_KEEP_LAYERS)),
+            stop_early=layers_data.get("stop_early", False),
+            exit_timeout=layers_data.get("exit_timeout", 1.0),
+        )
+
+        # Parse close waves
+        waves_data = data.get("waves", {})
+        waves = WavesConfig(
+            heavy=tuple(waves_data.get("heavy", DEFAULT_HEAVY_CLASSES)),
+            concurrency=waves_data.get("concurrency", 2),
+            pressure_limit=waves_data.get("pressure_limit", 60.0),
+            interval=waves_data.get("interval", 0.25),
+        )
+
+        # Parse per-app rules and compile them once
+        for i, rule_data in enumerate(data.get("rules", []), 1):
+            if "namespace" in rule_data:
+                raise ValueError(
+                    f"rule {i}: namespace is not supported, layers are stopped per [layers]"
+                )
+        rules = tuple(
+            RuleConfig(
+                class_name=rule_data.get("class"),
+                comm=rule_data.get("comm"),
+                xwayland=rule_data.get("xwayland"),
+                regex=rule_data.get("regex", False),
+                action=rule_data.get("action"),
+                grace=rule_data.get("grace"),
+                sigterm_delay=rule_data.get("sigterm_delay"),
+                sigkill_delay=rule_data.get("sigkill_delay"),
+            )
+            for rule_data in data.get("rules", [])
+        )
+
+        config = Config(
+            timing=timing, colors=colors, ui=ui, layers=layers, waves=waves, rules=RuleIndex(rules)
+        )
         validate_config(config)
         return config
     except (ValueError, KeyError) as e:
@@ -197,6 +419,11 @@ def create_default_config():
 [timing]
 sigterm_delay = 8
 sigkill_delay = 15
+# Tune deadlines per app from how long it took to close before
+adaptive = true
+# Seconds to wait for the user to answer a "Save changes?" dialog before
+# the app's escalation resumes (0 to not wait)
+dialog_timeout = 60.0
 
 [colors]
 backdrop = "#0c0e14"
@@ -212,6 +439,37 @@ status_closed = "#9ece6a"
 [ui]
 border_radius = 16
 modal_border_radius = 10
+
+[layers]
+# Layer namespaces kept until Hyprland exits. With stop_early = true the
+# others are stopped while windows close, and stay stopped on cancel
+keep = ["hyprhalt", "wallpaper", "hyprpaper", "swww-daemon", "mpvpaper", "waybar"]
+stop_early = false
+# Seconds to wait for layer processes to exit before exiting Hyprland
+exit_timeout = 1.0
+
+[waves]
+# Classes that write a lot to disk while closing. With pressure stall
+# information (/proc/pressure) they are closed a few at a time, more while
+# IO and memory pressure stay below pressure_limit (percent), fewer above
+heavy = ["firefox", "librewolf", "chromium", "google-chrome", "brave-browser", "thunderbird", "code", "code-oss", "jetbrains-idea"]
+concurrency = 2
+pressure_limit = 60.0
+interval = 0.25
+
+# Per-app overrides, first match wins. Match on class and/or comm
+# (exact, or full regex with regex = true) and/or xwayland.
+#
+# [[rules]]
+# class = "firefox"
+# grace = 5            # seconds to finish after the window closes
+# sigterm_delay = 20
+# sigkill_delay = 30
+#
+# [[rules]]
+# class = "^steam_app_[0-9]+$"
+# regex = true
+# action = "kill"      # or "skip" to leave the app alone
 """
 
     with open(config_file, "w") as f:
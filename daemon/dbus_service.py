@@ -1,11 +1,15 @@
 """D-Bus service for UI communication."""
 
-import json
 import logging
 import os
+from typing import Optional
+
 import dbus
 import dbus.service
 from dbus.mainloop.glib import DBusGMainLoop
+from gi.repository import GLib
+
+from .apps_snapshot import AppsSnapshot
 
 logger = logging.getLogger("hyprhalt")
 
@@ -13,63 +17,168 @@ logger = logging.getLogger("hyprhalt")
 class HyprHaltService(dbus.service.Object):
     """D-Bus service for hyprhalt UI."""
 
-    def __init__(self, manager, verbose: bool = False):
-        self.manager = manager
+    def __init__(self, manager, verbose: bool = False, on_start=None):
+        self._manager = manager
+        # Last published (pid, class, status) per UI entry and phase, so
+        # signals are only emitted on transitions
+        self._app_states: dict[str, tuple[int, str, str]] = {}
+        self._phase: Optional[str] = None
         self.verbose = verbose
+        # Set by a resident daemon, which can start shutdowns on request
+        self.on_start = on_start
         self.bus = dbus.SessionBus()
         bus_name = dbus.service.BusName("org.hyprland.HyprHalt", self.bus)
         super().__init__(bus_name, "/org/hyprland/HyprHalt")
-        self.cancelled = False
-        self.force_killed = False
+        # Set by start_shutdown() while a shutdown is running
+        self.on_cancel = None
+        self.on_force_kill = None
         runtime_dir = os.getenv("XDG_RUNTIME_DIR", f"/run/user/{os.getuid()}")
         self.apps_file = f"{runtime_dir}/hyprhalt-apps.json"
+        self.apps_snapshot = AppsSnapshot(self.apps_file)
 
-    @dbus.service.method("org.hyprland.HyprHalt", in_signature="", out_signature="")
+    @dbus.service.method("org.hyprland.HyprHalt", in_signature="", out_signature="b")
     def Cancel(self):
-        """Cancel shutdown and exit."""
+        """Cancel the shutdown, leaving apps and Hyprland running.
+
+        Returns whether a shutdown was running to cancel; Finished is
+        emitted once it has stopped.
+        """
         logger.info("Cancel requested via D-Bus")
-        self.cancelled = True
+        return self._schedule(self.on_cancel)
 
-    @dbus.service.method("org.hyprland.HyprHalt", in_signature="", out_signature="")
+    @dbus.service.method("org.hyprland.HyprHalt", in_signature="", out_signature="b")
     def ForceKill(self):
-        """Force kill all apps immediately."""
+        """SIGKILL all remaining apps and finish the shutdown.
+
+        Returns whether a shutdown was running; Finished is emitted once
+        it has completed.
+        """
         logger.info("Force kill requested via D-Bus")
-        self.force_killed = True
+        return self._schedule(self.on_force_kill)
+
+    @dbus.service.signal("org.hyprland.HyprHalt", signature="s")
+    def Finished(self, outcome):
+        """Emitted when a shutdown ends: "done", "cancelled" or "failed"."""
+
+    def _schedule(self, handler) -> bool:
+        """Run a shutdown transition from the main loop as soon as possible."""
+        if not handler:
+            return False
+
+        def run():
+            handler()
+            return False
+
+        # Ahead of any poll or deadline timer that is already due
+        GLib.idle_add(run, priority=GLib.PRIORITY_HIGH)
+        return True
+
+    @dbus.service.method("org.hyprland.HyprHalt", in_signature="sis", out_signature="b")
+    def StartShutdown(self, post_cmd, vt, text):
+        """Start a shutdown in a resident daemon.
+
+        An empty post_cmd or text and a vt of 0 mean the defaults. Returns
+        False if no shutdown could be started.
+        """
+        if not self.on_start:
+            return False
+        return self.on_start(str(post_cmd) or None, int(vt) or None, str(text) or "Exiting")
+
+    @property
+    def manager(self):
+        return self._manager
+
+    @manager.setter
+    def manager(self, manager):
+        """Attach the ShutdownManager of a new shutdown, or None when idle."""
+        self._manager = manager
+        self._app_states = {}
+        self._phase = None
+
+    @dbus.service.method("org.hyprland.HyprHalt", in_signature="", out_signature="sda(iss)")
+    def GetStatus(self):
+        """Get the phase, seconds elapsed and (pid, class, status) of every app.
+
+        The phase is "idle" while a resident daemon waits for a request.
+        """
+        if not self.manager:
+            return "idle", 0.0, dbus.Array([], signature="(iss)")
+        apps = [(app["pid"], app["appName"], app["appStatus"]) for app in self.manager.app_states()]
+        return self.manager.phase, self.manager.elapsed(), dbus.Array(apps, signature="(iss)")
+
+    @dbus.service.signal("org.hyprland.HyprHalt", signature="iss")
+    def AppStateChanged(self, pid, class_name, status):
+        """Emitted when an app's status changes, with "dead" once it is gone."""
+
+    @dbus.service.signal("org.hyprland.HyprHalt", signature="s")
+    def PhaseChanged(self, phase):
+        """Emitted when the shutdown moves to another phase."""
+
+    def publish_phase(self, phase: str):
+        """Emit PhaseChanged if the phase differs from the last one."""
+        if phase == self._phase:
+            return
+        self._phase = phase
+        try:
+            self.PhaseChanged(phase)
+        except Exception as e:
+            logger.debug(f"Failed to emit PhaseChanged: {e}")
 
     @dbus.service.method("org.hyprland.HyprHalt", in_signature="", out_signature="s")
     def GetAppsFile(self):
         """Get path to apps JSON file."""
         return self.apps_file
 
+    @dbus.service.method("org.hyprland.HyprHalt", in_signature="", out_signature="t")
+    def GetAppsGeneration(self):
+        """Get the number of times the apps file has changed."""
+        return self.apps_snapshot.generation
+
     def update_apps_file(self):
-        """Write current app list to JSON file."""
-        apps = []
-        for app in self.manager.windows:
-            apps.append(
-                {
-                    "appName": app.class_name,
-                    "appStatus": app.status,
-                    "pid": app.pid,
-                }
-            )
+        """Write current app list to JSON file and signal what changed."""
+        if not self.manager:
+            return
+        apps = self.manager.app_states()
+        self._publish_app_states(apps)
 
         try:
-            with open(self.apps_file, "w") as f:
-                json.dump(apps, f)
-            logger.debug(f"Updated apps file with {len(apps)} apps")
+            if self.apps_snapshot.update(apps):
+                logger.debug(
+                    f"Updated apps file with {len(apps)} apps "
+                    f"(generation {self.apps_snapshot.generation})"
+                )
         except Exception as e:
             logger.error(f"Failed to write apps file: {e}")
 
+    def _publish_app_states(self, apps: list[dict]):
+        """Emit AppStateChanged for apps whose status changed or that are gone."""
+        states = {app["key"]: (app["pid"], app["appName"], app["appStatus"]) for app in apps}
+        changed = {
+            state for key, state in states.items() if self._app_states.get(key) != state
+        }
+        changed.update(
+            (pid, class_name, "dead")
+            for key, (pid, class_name, status) in self._app_states.items()
+            if key not in states and status != "dead"
+        )
+        self._app_states = states
+
+        for pid, class_name, status in sorted(changed):
+            try:
+                self.AppStateChanged(pid, class_name, status)
+            except Exception as e:
+                logger.debug(f"Failed to emit AppStateChanged: {e}")
+                return
+
     def cleanup(self):
         """Remove temp file."""
         try:
-            if os.path.exists(self.apps_file):
-                os.remove(self.apps_file)
+            self.apps_snapshot.remove()
         except Exception:
             pass
 
 
-def start_service(manager, verbose: bool = False):
+def start_service(manager, verbose: bool = False, on_start=None):
     """Initialize D-Bus service and return the service object."""
     DBusGMainLoop(set_as_default=True)
-    return HyprHaltService(manager, verbose)
+    return HyprHaltService(manager, verbose, on_start)
@@ -0,0 +1,156 @@
+"""Per-class close time history, used to tune escalation deadlines.
+
+Every shutdown appends one JSON line per app to
+``$XDG_STATE_HOME/hyprhalt/history.jsonl``: how long the app took to exit
+and whether it needed SIGTERM or SIGKILL. Only the most recent
+MAX_SAMPLES per class are used, and the file is rewritten with just
+those once it grows past COMPACT_LINES.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger("hyprhalt")
+
+MAX_SAMPLES = 20
+COMPACT_LINES = 2000
+# Samples needed before a class's deadlines are tuned
+MIN_SAMPLES = 3
+# Share of runs needing a signal for a class to count as hung
+HUNG_RATIO = 0.8
+# Deadlines for hung classes
+EARLY_SIGTERM = 1.0
+EARLY_SIGKILL = 3.0
+# Headroom over the 95th percentile close time of reliable classes
+MARGIN = 1.5
+MAX_LEARNED_DELAY = 60.0
+
+
+class Sample(NamedTuple):
+    seconds: float
+    outcome: str  # "closed", "sigterm" or "sigkill"
+
+
+class Deadlines(NamedTuple):
+    grace: float
+    sigterm_delay: float
+    sigkill_delay: float
+
+
+def get_history_path() -> Path:
+    """Get the history file path under $XDG_STATE_HOME."""
+    state_home = os.getenv("XDG_STATE_HOME") or str(Path.home() / ".local" / "state")
+    return Path(state_home) / "hyprhalt" / "history.jsonl"
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class History:
+    """Recent close samples per window class."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path or get_history_path()
+        self.samples: dict[str, list[Sample]] = {}
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "History":
+        """Read the history file, compacting it if it grew too long.
+
+        A missing or unreadable file gives an empty history.
+        """
+        history = cls(path)
+        try:
+            with open(history.path, "rb") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return history
+        except OSError as e:
+            logger.debug(f"Failed to read close history: {e}")
+            return history
+
+        for line in lines:
+            try:
+                entry = json.loads(line)
+                sample = Sample(float(entry["seconds"]), entry["outcome"])
+                history.samples.setdefault(entry["class"], []).append(sample)
+            except (ValueError, KeyError, TypeError):
+                # A torn write from an interrupted run
+                continue
+
+        for samples in history.samples.values():
+            del samples[:-MAX_SAMPLES]
+
+        if len(lines) > COMPACT_LINES:
+            try:
+                history.compact()
+            except OSError as e:
+                logger.debug(f"Failed to compact close history: {e}")
+        return history
+
+    def compact(self):
+        """Rewrite the file with only the samples still in use."""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                for class_name, samples in self.samples.items():
+                    for sample in samples:
+                        f.write(_encode(class_name, sample))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def record(self, entries: list[tuple[str, Sample]]):
+        """Append (class_name, sample) entries to the file."""
+        if not entries:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write("".join(_encode(class_name, sample) for class_name, sample in entries))
+
+    def deadlines(
+        self, class_name: str, grace: float, sigterm_delay: float, sigkill_delay: float
+    ) -> Optional[Deadlines]:
+        """Suggest deadlines for a class from its history.
+
+        Classes that nearly always needed a signal are escalated early,
+        classes that close on their own get enough time to do so. Returns
+        None without enough samples.
+        """
+        samples = self.samples.get(class_name)
+        if not samples or len(samples) < MIN_SAMPLES:
+            return None
+
+        killed = sum(1 for s in samples if s.outcome == "sigkill") / len(samples)
+        signalled = sum(1 for s in samples if s.outcome != "closed") / len(samples)
+
+        if killed >= HUNG_RATIO:
+            return Deadlines(
+                grace, min(sigterm_delay, EARLY_SIGTERM), min(sigkill_delay, EARLY_SIGKILL)
+            )
+        if signalled >= HUNG_RATIO:
+            return Deadlines(grace, min(sigterm_delay, EARLY_SIGTERM), sigkill_delay)
+
+        closed = [s.seconds for s in samples if s.outcome == "closed"]
+        needed = min(percentile(closed, 95) * MARGIN, MAX_LEARNED_DELAY)
+        if needed <= sigterm_delay:
+            return Deadlines(max(grace, needed), sigterm_delay, sigkill_delay)
+        return Deadlines(
+            max(grace, needed), needed, max(sigkill_delay, needed + sigkill_delay - sigterm_delay)
+        )
+
+
+def _encode(class_name: str, sample: Sample) -> str:
+    entry = {"class": class_name, "seconds": round(sample.seconds, 3), "outcome": sample.outcome}
+    return json.dumps(entry, separators=(",", ":")) + "\n"
@@ -2,13 +2,45 @@
 
 import json
 import os
+import re
 import socket
 from pathlib import Path
-from typing import Optional
+from typing import NamedTuple, Optional
+
+from . import trace
+
+# Initial size of the reply buffer, doubled whenever a reply outgrows it
+RECV_BUFFER_SIZE = 64 * 1024
+
+# The j/clients fields the daemon needs. Quotes inside JSON strings are
+# always escaped, so these can't match text inside a window title.
+_ADDRESS_RE = re.compile(rb'"address":\s*"(0x[0-9a-fA-F]+)"')
+_PID_RE = re.compile(rb'"pid":\s*(-?\d+)')
+_CLASS_RE = re.compile(rb'"class":\s*"([^"\\]*(?:\\.[^"\\]*)*)"')
+_XWAYLAND_RE = re.compile(rb'"xwayland":\s*(true|false)')
+
+
+class ClientInfo(NamedTuple):
+    """The fields of a j/clients entry the daemon uses."""
+
+    address: str
+    pid: int
+    class_name: str
+    xwayland: bool
 
 
 def get_socket_path() -> str:
     """Get Hyprland socket path from environment."""
+    return f"{_get_instance_dir()}/.socket.sock"
+
+
+def get_event_socket_path() -> str:
+    """Get Hyprland event socket (socket2) path from environment."""
+    return f"{_get_instance_dir()}/.socket2.sock"
+
+
+def _get_instance_dir() -> str:
+    """Get the runtime directory of the current Hyprland instance."""
     his = os.getenv("HYPRLAND_INSTANCE_SIGNATURE")
     if not his:
         raise RuntimeError(
@@ -16,42 +48,107 @@ def get_socket_path() -> str:
         )
 
     runtime_dir = os.getenv("XDG_RUNTIME_DIR", f"/run/user/{os.getuid()}")
-    return f"{runtime_dir}/hypr/{his}/.socket.sock"
+    return f"{runtime_dir}/hypr/{his}"
+
+
+def normalize_address(address: str) -> str:
+    """Return a window address in the 0x-prefixed form used by j/clients.
+
+    Events on socket2 report addresses as bare hex digits.
+    """
+    return address if address.startswith("0x") else f"0x{address}"
 
 
 def send_command(cmd: str) -> str:
     """Send command to Hyprland socket and return response."""
+    return send_command_raw(cmd).decode(errors="replace")
+
+
+def send_command_raw(cmd: str) -> bytearray:
+    """Send command to Hyprland socket and return the undecoded response.
+
+    The reply is received straight into one buffer, which only grows
+    (by doubling) for replies larger than RECV_BUFFER_SIZE.
+    """
     sock_path = get_socket_path()
 
     sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
     sock.settimeout(5.0)
 
-    try:
-        sock.connect(sock_path)
-        sock.sendall(cmd.encode())
+    with trace.span("ipc", "ipc", cmd=cmd[:80]):
+        try:
+            sock.connect(sock_path)
+            sock.sendall(cmd.encode())
 
-        response = b""
-        while True:
-            chunk = sock.recv(8192)
-            if not chunk:
-                break
-            response += chunk
+            buffer = bytearray(RECV_BUFFER_SIZE)
+            size = 0
+            while True:
+                if size == len(buffer):
+                    buffer.extend(bytes(len(buffer)))
+                with memoryview(buffer) as view:
+                    received = sock.recv_into(view[size:])
+                if not received:
+                    break
+                size += received
 
-        return response.decode(errors="replace")
-    finally:
-        sock.close()
+            del buffer[size:]
+            return buffer
+        finally:
+            sock.close()
 
 
 def get_clients() -> list[dict]:
     """Query Hyprland for all client windows."""
-    response = send_command("j/clients")
-    return json.loads(response)
+    return json.loads(send_command_raw("j/clients"))
+
+
+def get_client_fields() -> list[ClientInfo]:
+    """Query Hyprland for the address, PID, class and XWayland flag of every window.
+
+    Much cheaper than get_clients() for large client lists, since only
+    these four fields are picked out of the reply.
+    """
+    return parse_client_fields(send_command_raw("j/clients"))
+
+
+def parse_client_fields(data: bytes) -> list[ClientInfo]:
+    """Pick the ClientInfo fields out of a raw j/clients reply.
+
+    Every client has each field exactly once, so the n-th match of each
+    field belongs to the n-th client. Falls back to a full JSON decode if
+    the counts don't line up.
+    """
+    addresses = _ADDRESS_RE.findall(data)
+    pids = _PID_RE.findall(data)
+    classes = _CLASS_RE.findall(data)
+    xwayland = _XWAYLAND_RE.findall(data)
+
+    if not (len(addresses) == len(pids) == len(classes) == len(xwayland)):
+        return [
+            ClientInfo(
+                client.get("address"),
+                client.get("pid", -1),
+                client.get("class", "unknown"),
+                client.get("xwayland", False),
+            )
+            for client in json.loads(data)
+        ]
+
+    return [
+        ClientInfo(
+            address.decode(),
+            int(pid),
+            # Escapes are rare in classes, only decode those that have one
+            json.loads(b'"' + class_name + b'"') if b"\\" in class_name else class_name.decode(),
+            flag == b"true",
+        )
+        for address, pid, class_name, flag in zip(addresses, pids, classes, xwayland)
+    ]
 
 
 def get_layers() -> list[dict]:
     """Query Hyprland for all layer shell surfaces."""
-    response = send_command("j/layers")
-    data = json.loads(response)
+    data = json.loads(send_command_raw("j/layers"))
 
     # Flatten layer structure
     layers = []
@@ -69,6 +166,35 @@ def close_window(address: str) -> bool:
     return response.strip() == "ok"
 
 
+def close_windows(addresses: list[str]) -> dict[str, bool]:
+    """Close several windows with a single batched IPC request.
+
+    Hyprland runs every command of a ``[[BATCH]]`` request in order and
+    joins the individual replies with blank lines, so each window gets its
+    close request at about the same moment instead of one connection each.
+    Returns a mapping of address to whether Hyprland replied ``ok``.
+    """
+    if not addresses:
+        return {}
+    return parse_close_replies(addresses, send_command(close_windows_command(addresses)))
+
+
+def close_windows_command(addresses: list[str]) -> str:
+    """Build the batched request that closes the given windows."""
+    return "[[BATCH]]" + ";".join(
+        f"/dispatch closewindow address:{address}" for address in addresses
+    )
+
+
+def parse_close_replies(addresses: list[str], data: str) -> dict[str, bool]:
+    """Map each address to whether its closewindow in a batch replied ``ok``."""
+    replies = data.split("\n\n\n")
+    return {
+        address: i < len(replies) and replies[i].strip() == "ok"
+        for i, address in enumerate(addresses)
+    }
+
+
 def exit_hyprland():
     """Exit Hyprland."""
     send_command("/dispatch exit")
@@ -91,3 +217,55 @@ def get_hyprland_pid() -> Optional[int]:
             return int(f.readline().strip())
     except (ValueError, IOError):
         return None
+
+
+class EventListener:
+    """Non-blocking reader for Hyprland's event socket (socket2).
+
+    Meant to be attached to a main loop: call read_events() whenever
+    fileno() becomes readable.
+    """
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(get_event_socket_path())
+        except OSError:
+            self.sock.close()
+            raise
+        self.sock.setblocking(False)
+        self._buffer = b""
+        self.closed = False
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def read_events(self) -> list[tuple[str, str]]:
+        """Drain pending events as (name, data) pairs.
+
+        Sets ``closed`` once Hyprland hangs up.
+        """
+        while True:
+            try:
+                chunk = self.sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                chunk = b""
+            if not chunk:
+                self.closed = True
+                break
+            self._buffer += chunk
+
+        *lines, self._buffer = self._buffer.split(b"\n")
+
+        events = []
+        for line in lines:
+            name, sep, data = line.decode(errors="replace").partition(">>")
+            if sep:
+                events.append((name, data))
+        return events
+
+    def close(self):
+        self.sock.close()
+        self.closed = True
@@ -6,40 +6,18 @@ import os
 import signal
 import sys
 import time
-from pathlib import Path
-from gi.repository import GLib
 
-from .app_tracker import get_all_apps, filter_own_process
-from .shutdown_manager import ShutdownManager
-from .dbus_service import start_service
-from .config import load_config, create_default_config
+from . import __version__
+
+# GLib, dbus-python and the shutdown machinery are imported in
+# start_shutdown() and resident.py so that --version, --generate-config,
+# --config-check and requests to a resident daemon start fast.
+# benchmarks/bench_import.py keeps an eye on this.
 
 logger = logging.getLogger("hyprhalt")
 
-
-def get_version() -> str:
-    """Get version from pyproject.toml."""
-    try:
-        import tomllib
-    except ImportError:
-        import tomli as tomllib
-    
-    # Try to find pyproject.toml
-    search_paths = [
-        Path(__file__).parent.parent / "pyproject.toml",  # Development
-        Path("/usr/share/hyprhalt/pyproject.toml"),  # System install
-    ]
-    
-    for path in search_paths:
-        if path.exists():
-            try:
-                with open(path, "rb") as f:
-                    data = tomllib.load(f)
-                    return data.get("project", {}).get("version", "unknown")
-            except Exception:
-                pass
-    
-    return "unknown"
+# Seconds to wait for SIGKILLed processes to disappear before finishing
+KILL_CONFIRM_TIMEOUT = 1.0
 
 
 def daemonize():
@@ -114,6 +92,21 @@ def parse_args():
         action="store_true",
         help="Enable verbose logging",
     )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="Write a Chrome trace of the shutdown to $XDG_RUNTIME_DIR/hyprhalt-trace.json",
+    )
+    parser.add_argument(
+        "--resident",
+        action="store_true",
+        help="Stay running and start shutdowns on request (for exec-once or a systemd user unit)",
+    )
+    parser.add_argument(
+        "--standalone",
+        action="store_true",
+        help="Don't hand the shutdown to a resident hyprhalt",
+    )
     parser.add_argument(
         "--text",
         type=str,
@@ -126,15 +119,18 @@ def parse_args():
 
 def main():
     """Main entry point."""
+    started = time.monotonic()
     args = parse_args()
 
     # Handle --version
     if args.version:
-        print(f"hyprhalt {get_version()}")
+        print(f"hyprhalt {__version__}")
         sys.exit(0)
 
     # Handle --generate-config
     if args.generate_config:
+        from .config import create_default_config
+
         try:
             create_default_config()
             sys.exit(0)
@@ -152,6 +148,8 @@ def main():
 
     # Handle --config-check
     if args.config_check:
+        from .config import load_config
+
         try:
             config = load_config()
             logger.info("Configuration is valid")
@@ -159,6 +157,8 @@ def main():
             logger.info("[timing]")
             logger.info(f"  sigterm_delay = {config.timing.sigterm_delay}")
             logger.info(f"  sigkill_delay = {config.timing.sigkill_delay}")
+            logger.info(f"  adaptive = {str(config.timing.adaptive).lower()}")
+            logger.info(f"  dialog_timeout = {config.timing.dialog_timeout}")
             logger.info("")
             logger.info("[colors]")
             logger.info(f"  backdrop = {config.colors.backdrop}")
@@ -174,6 +174,23 @@ def main():
             logger.info("[ui]")
             logger.info(f"  border_radius = {config.ui.border_radius}")
             logger.info(f"  modal_border_radius = {config.ui.modal_border_radius}")
+            logger.info("")
+            logger.info("[layers]")
+            logger.info(f"  keep = {list(config.layers.keep)}")
+            logger.info(f"  stop_early = {str(config.layers.stop_early).lower()}")
+            logger.info(f"  exit_timeout = {config.layers.exit_timeout}")
+            logger.info("")
+            logger.info("[waves]")
+            logger.info(f"  heavy = {list(config.waves.heavy)}")
+            logger.info(f"  concurrency = {config.waves.concurrency}")
+            logger.info(f"  pressure_limit = {config.waves.pressure_limit}")
+            logger.info(f"  interval = {config.waves.interval}")
+            for rule in config.rules.rules:
+                logger.info("")
+                logger.info("[[rules]]")
+                for key, value in rule._asdict().items():
+                    if value != rule._field_defaults[key]:
+                        logger.info(f"  {'class' if key == 'class_name' else key} = {value}")
             sys.exit(0)
         except Exception as e:
             logger.error(f"Configuration validation failed: {e}")
@@ -184,34 +201,149 @@ def main():
         logger.error("Not running under Hyprland")
         sys.exit(1)
 
+    if args.resident:
+        from .resident import run_resident
+
+        run_resident(args)
+
+    # A resident hyprhalt has everything loaded already
+    if not args.standalone:
+        from .client import request_shutdown
+
+        reply = request_shutdown(args, started)
+        if reply is not None:
+            if not reply.get("ok"):
+                logger.error(f"Resident hyprhalt refused the shutdown: {reply.get('error')}")
+                sys.exit(1)
+            logger.debug("Shutdown handed to resident hyprhalt")
+            sys.exit(0)
+
     # Daemonize unless --no-fork
     if not args.no_fork:
         daemonize()
     else:
         signal.signal(signal.SIGHUP, signal.SIG_IGN)
 
-    # Get all apps
-    try:
-        windows, layers = get_all_apps()
-    except Exception as e:
-        logger.error(f"Error getting apps: {e}")
-        sys.exit(1)
+    run_shutdown(args, started)
+
+
+def run_shutdown(args, started: float):
+    """Run a single shutdown in this process and exit once it is over.
+
+    ``started`` is the time.monotonic() timestamp of the invocation.
+    """
+    from gi.repository import GLib
+
+    main_loop = GLib.MainLoop()
+    outcome = None
+
+    def on_done(result: str):
+        nonlocal outcome
+        outcome = result
+        main_loop.quit()
+
+    cancel = start_shutdown(args, started, on_done)
+    if outcome is None:
+        try:
+            main_loop.run()
+        except KeyboardInterrupt:
+            logger.info("Interrupted by user")
+            cancel()
+
+    sys.exit(1 if outcome == "failed" else 0)
+
+
+def start_shutdown(
+    args,
+    started: float,
+    on_done,
+    config=None,
+    event_listener=None,
+    clients=None,
+    dbus_service=None,
+):
+    """Discover apps and drive the shutdown from the GLib main loop.
+
+    Everything runs from callbacks on the default main loop, which the
+    caller runs. on_done is called with "done", "cancelled" or "failed"
+    when the shutdown is over. A resident daemon passes in what it keeps
+    warm: the config, a subscribed event listener, a current client list
+    and its D-Bus service. Returns a function that cancels the shutdown.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from gi.repository import GLib
+
+    from . import hyprland_ipc, trace
+    from .app_tracker import (
+        apps_from_clients,
+        apps_from_layers,
+        get_hyprland_children,
+    )
+    from .async_ipc import AsyncIPC
+    from .config import load_config
+    from .dbus_service import start_service
+    from .history import History
+    from .process_watch import CgroupWatcher, ProcessWatcher
+    from .procfs import ProcSnapshot
+    from .scheduler import TickScheduler
+    from .shutdown_manager import ShutdownManager
+    from .ui_channel import UIChannel
+
+    if args.trace:
+        trace.enable(int(started * 1e9))
+        trace.instant("start")
+
+    def finish(result: str):
+        """Write the trace file if tracing is on and report the outcome."""
+        manager.set_phase(result)
+        try:
+            path = trace.write()
+            if path:
+                logger.info(f"Trace written to {path}")
+        except OSError as e:
+            logger.warning(f"Failed to write trace: {e}")
+        finally:
+            # A resident daemon runs more shutdowns, each traced on request
+            trace.disable()
+        if dbus_service:
+            dbus_service.on_cancel = dbus_service.on_force_kill = None
+            try:
+                dbus_service.Finished(result)
+            except Exception as e:
+                logger.debug(f"Failed to emit Finished: {e}")
+        on_done(result)
 
-    # Filter out our own process
-    windows = filter_own_process(windows, os.getpid())
+    def take_snapshot():
+        with trace.span("proc snapshot"):
+            return ProcSnapshot.take()
 
-    logger.debug(f"Found {len(windows)} windows and {len(layers)} layers")
+    # Subscribe to window events before listing apps so no close is missed
+    if event_listener is None:
+        try:
+            event_listener = hyprland_ipc.EventListener()
+        except Exception as e:
+            logger.warning(f"Failed to connect to Hyprland event socket, polling instead: {e}")
 
     # Load configuration
-    config = load_config()
+    if config is None:
+        config = load_config()
     logger.debug(
         f"Loaded config: sigterm={config.timing.sigterm_delay}s, sigkill={config.timing.sigkill_delay}s"
     )
 
-    # Create shutdown manager
+    # Query clients, layers and /proc concurrently while the UI starts
+    discovery = ThreadPoolExecutor(max_workers=4, thread_name_prefix="discovery")
+    clients_future = discovery.submit(hyprland_ipc.get_client_fields) if clients is None else None
+    layers_future = discovery.submit(hyprland_ipc.get_layers)
+    snapshot_future = discovery.submit(take_snapshot)
+    # Close history only tunes deadlines, nothing waits for it
+    history_future = discovery.submit(History.load) if config.timing.adaptive else None
+
+    # Create shutdown manager, apps are added as discovery completes
     manager = ShutdownManager(
-        windows=windows,
-        layers=layers,
+        windows=[],
+        layers=[],
         config=config,
         dry_run=args.dry_run,
         no_exit=args.no_exit,
@@ -221,109 +353,319 @@ def main():
         custom_text=args.text,
     )
 
-    # Show UI immediately
-    manager.show_ui()
+    # Listen for the UI before starting it so it can connect right away
+    try:
+        ui_channel = UIChannel()
+    except OSError as e:
+        logger.warning(f"Failed to create UI status channel: {e}")
+        ui_channel = None
 
-    # Start graceful close
-    manager.graceful_close_windows()
+    # Show UI immediately
+    with trace.span("ui spawn"):
+        manager.show_ui()
 
-    # Start D-Bus service
     try:
-        dbus_service = start_service(manager, args.verbose)
-        logger.debug("D-Bus service started")
-        # Write initial apps file
-        dbus_service.update_apps_file()
+        # Start graceful close as soon as the client list arrives
+        if clients_future:
+            with trace.span("wait for clients"):
+                clients = clients_future.result()
+        windows = apps_from_clients(clients)
+        manager.add_windows(windows)
+        manager.graceful_close_windows()
+        logger.debug(
+            f"Close requested for {len(windows)} windows "
+            f"{(time.monotonic() - started) * 1000:.1f} ms after invocation"
+        )
+
+        # Hyprland children and process trees need the /proc snapshot
+        with trace.span("process trees"):
+            snapshot = snapshot_future.result()
+            children = []
+            hyprland_pid = hyprland_ipc.get_hyprland_pid()
+            if hyprland_pid:
+                children = get_hyprland_children(hyprland_pid, snapshot)
+            # Layer shells (bars, wallpaper, ...) are stopped in stages by
+            # the layer policy, children that own a window join its process
+            manager.layers = apps_from_layers(layers_future.result())
+            layer_pids = {layer.pid for layer in manager.layers}
+            manager.add_windows([app for app in children if app.pid not in layer_pids])
+            manager.track_descendants(snapshot)
     except Exception as e:
-        logger.warning(f"Failed to start D-Bus service: {e}")
-        dbus_service = None
+        logger.error(f"Error getting apps: {e}")
+        manager.stop_ui()
+        if ui_channel:
+            ui_channel.close()
+        finish("failed")
+        return lambda: None
+    finally:
+        discovery.shutdown(wait=False)
 
-    last_sigterm = 0
-    last_sigkill = 0
+    logger.debug(
+        f"Found {len(manager.windows)} windows and {len(manager.layers)} layers"
+    )
 
-    # Create GLib main loop for D-Bus
-    main_loop = GLib.MainLoop()
+    # Layers nobody needs during the window phase exit alongside the apps
+    if config.layers.stop_early:
+        manager.stop_layers(early=True)
 
-    def check_status():
-        """Periodic check called by GLib timeout."""
-        nonlocal last_sigterm, last_sigkill
-
-        # Check if UI process exited
-        if manager.ui_process:
-            exit_code = manager.ui_process.poll()
-            if exit_code is not None:
-                if exit_code == 2:
-                    # Cancel button clicked
-                    logger.info("UI exited with code 2 - Cancel requested")
-                    manager.close_ui()
-                    if dbus_service:
-                        dbus_service.cleanup()
-                    main_loop.quit()
-                    return False
-                elif exit_code == 3:
-                    # Force kill button clicked
-                    logger.info("UI exited with code 3 - Force kill requested")
-                    manager.escalate_sigkill()
-                    time.sleep(1)
-                    manager.finish_shutdown()
-                    if dbus_service:
-                        dbus_service.cleanup()
-                    main_loop.quit()
-                    return False
-
-        manager.check_windowless_pids()
+    # Start D-Bus service, a resident daemon already has one
+    if dbus_service:
+        dbus_service.manager = manager
+    else:
+        try:
+            dbus_service = start_service(manager, args.verbose)
+            logger.debug("D-Bus service started")
+        except Exception as e:
+            logger.warning(f"Failed to start D-Bus service: {e}")
 
-        # Update apps file for UI
+    def publish_status():
+        """Push current app status to the UI, the apps file and D-Bus."""
+        if ui_channel:
+            ui_channel.publish(manager.app_states())
         if dbus_service:
+            dbus_service.publish_phase(manager.phase)
             dbus_service.update_apps_file()
 
+    # Compositor queries from here on must not stall the loop
+    manager.ipc = AsyncIPC()
+
+    def on_phase(phase: str):
+        if dbus_service:
+            dbus_service.publish_phase(phase)
+
+    manager.on_phase = on_phase
+
+    publish_status()
+
+    completed = False
+    events_source = None
+
+    def stop_watching():
+        """Drop every timer and watch this shutdown set up."""
+        scheduler.stop()
+        process_watcher.close()
+        ui_watcher.close()
+        cgroup_watcher.close()
+        manager.ipc.close()
+        if events_source:
+            GLib.source_remove(events_source)
+        if ui_channel:
+            ui_channel.close()
+
+    def complete():
+        """Run the final shutdown sequence exactly once."""
+        nonlocal completed
+        if completed:
+            return
+        completed = True
+
+        stop_watching()
+        if config.timing.adaptive:
+            try:
+                (manager.history or History()).record(manager.history_samples())
+            except OSError as e:
+                logger.warning(f"Failed to save close history: {e}")
+        with trace.span("finish shutdown"):
+            manager.finish_shutdown()
+        if dbus_service:
+            dbus_service.cleanup()
+        finish("done")
+
+    def cancel():
+        """Abort the shutdown and leave everything running."""
+        nonlocal completed
+        if completed:
+            return
+        completed = True
+
+        trace.instant("cancel")
+        stop_watching()
+        manager.stop_ui()
+        if dbus_service:
+            dbus_service.cleanup()
+        finish("cancelled")
+
+    kill_confirm_timer = None
+    deadline_timer = None
+
+    def confirm_kill():
+        """Finish once everything SIGKILLed is gone, or after a bounded wait."""
+        nonlocal kill_confirm_timer
+        if kill_confirm_timer is None:
+            # Exits are confirmed by the watchers, this only bounds the wait
+            kill_confirm_timer = scheduler.call_later(KILL_CONFIRM_TIMEOUT, complete)
+
+    def kill_and_finish():
+        """SIGKILL what is left and finish once it is gone."""
+        manager.force_kill()
+        scheduler.hurry()
+        confirm_kill()
+
+    def arm_deadline():
+        """Set a timer for the earliest per-app escalation still pending."""
+        nonlocal deadline_timer
+        if deadline_timer is not None:
+            scheduler.cancel(deadline_timer)
+            deadline_timer = None
+        deadline = manager.next_deadline()
+        if deadline is not None:
+            deadline_timer = scheduler.call_later(deadline - manager.elapsed(), on_deadline)
+
+    def on_changed():
+        """Finish if everything is gone, otherwise update the UI."""
         if not manager.poll_windows():
-            # All windows closed
             logger.debug("All windows closed")
-            manager.finish_shutdown()
-            if dbus_service:
-                dbus_service.cleanup()
-            main_loop.quit()
+            # Subscribers see the last apps go before the phase changes
+            publish_status()
+            complete()
+        else:
+            # A heavy app that finished makes room for a queued one
+            if manager.waves_pending() and manager.release_wave(sample=False):
+                arm_deadline()
+            publish_status()
+
+    def on_events(fd, condition):
+        """Handle Hyprland socket2 events as soon as they arrive."""
+        nonlocal events_source
+        for name, data in event_listener.read_events():
+            manager.handle_event(name, data)
+
+        if event_listener.closed:
+            logger.debug("Hyprland event socket closed, falling back to polling")
+            manager.event_driven = False
+            events_source = None
             return False
 
-        elapsed = manager.elapsed()
-
-        # Escalate at configured sigterm_delay
-        if elapsed >= manager.config.timing.sigterm_delay and last_sigterm == 0:
-            logger.info(
-                f"{manager.config.timing.sigterm_delay} seconds elapsed, escalating to SIGTERM"
-            )
-            manager.escalate_sigterm()
-            last_sigterm = elapsed
-
-        # Escalate at configured sigkill_delay
-        if elapsed >= manager.config.timing.sigkill_delay and last_sigkill == 0:
-            logger.info(
-                f"{manager.config.timing.sigkill_delay} seconds elapsed, escalating to SIGKILL"
-            )
-            manager.escalate_sigkill()
-            last_sigkill = elapsed
-
-            # Force finish after SIGKILL
-            time.sleep(1)
-            manager.finish_shutdown()
-            if dbus_service:
-                dbus_service.cleanup()
-            main_loop.quit()
-            return False
+        on_changed()
+        return not completed
 
-        return True  # Continue calling
+    def on_process_exit(pid):
+        """Handle a tracked process exiting."""
+        logger.debug(f"PID {pid} exited")
+        manager.mark_exited(pid)
+        on_changed()
 
-    # Schedule periodic checks every 500ms
-    GLib.timeout_add(500, check_status)
+    def on_cgroup_empty(path):
+        """Handle an app's cgroup emptying out."""
+        logger.debug(f"cgroup {path} is empty")
+        manager.mark_cgroup_empty(path)
+        on_changed()
 
-    # Run main loop
-    try:
-        main_loop.run()
-    except KeyboardInterrupt:
-        logger.info("Interrupted by user")
-        manager.close_ui()
+    def on_history_loaded(future):
+        """Tune deadlines once the close history is read."""
+        try:
+            history = future.result()
+        except Exception as e:
+            logger.debug(f"Failed to load close history: {e}")
+            return False
+        if not completed:
+            manager.set_history(history)
+            arm_deadline()
+        return False
+
+    def on_ui_exit(pid):
+        """React to the UI's Cancel (exit code 2) and Force Kill (3) buttons."""
+        if not manager.ui_process:
+            return
+        exit_code = manager.ui_process.poll()
+        if exit_code is None:
+            return
+        # The UI is gone, don't handle its exit twice
+        manager.ui_process = None
+
+        if exit_code == 2:
+            logger.info("UI exited with code 2 - Cancel requested")
+            cancel()
+        elif exit_code == 3:
+            logger.info("UI exited with code 3 - Force kill requested")
+            force_kill()
+
+    def force_kill():
+        """Force kill on request, from the UI or D-Bus."""
+        if completed:
+            return
+        trace.instant("force kill")
+        kill_and_finish()
+
+    def on_deadline():
+        """Escalate the apps that are due and wait for the next deadline."""
+        nonlocal deadline_timer
+        deadline_timer = None
+        if manager.escalate_due():
+            logger.info(f"{manager.elapsed():.1f} seconds elapsed, escalated overdue apps")
+            scheduler.hurry()
+        if manager.windows and manager.all_killed():
+            confirm_kill()
+        else:
+            arm_deadline()
+
+    def on_awaiting():
+        """Re-arm escalation and show the app waiting on its dialog, or not."""
+        if not completed:
+            arm_deadline()
+            publish_status()
+
+    def on_wave():
+        """Resize the close wave from pressure until no heavy app is queued."""
+        if manager.release_wave():
+            arm_deadline()
+            publish_status()
+        if manager.waves_pending():
+            scheduler.call_later(config.waves.interval, on_wave)
+
+    def check_status():
+        """Poll what can't be watched, called with backoff by the scheduler."""
+        # A UI without a pidfd watch is polled here
+        if manager.ui_process and not ui_watched:
+            on_ui_exit(manager.ui_process.pid)
+            if completed:
+                return False
 
-    sys.exit(0)
+        manager.check_windowless_pids()
+        if manager.check_process_states():
+            arm_deadline()
+        on_changed()
+        return not completed
+
+    scheduler = TickScheduler(check_status)
+
+    # Get notified of process exits instead of waiting for the next poll
+    process_watcher = ProcessWatcher(on_process_exit)
+    manager.watch_processes(process_watcher)
+    cgroup_watcher = CgroupWatcher(on_cgroup_empty)
+    manager.watch_cgroups(cgroup_watcher)
+    ui_watcher = ProcessWatcher(on_ui_exit)
+    ui_watched = bool(manager.ui_process) and ui_watcher.watch(manager.ui_process.pid)
+
+    # Close dialogs pause and resume per-app deadlines
+    manager.on_awaiting = on_awaiting
+
+    # Keybinds and scripts can cancel or force kill over D-Bus
+    if dbus_service:
+        dbus_service.on_cancel = cancel
+        dbus_service.on_force_kill = force_kill
+
+    # React to window events immediately
+    if event_listener and not event_listener.closed:
+        manager.event_driven = True
+        events_source = GLib.io_add_watch(
+            event_listener.fileno(),
+            GLib.PRIORITY_DEFAULT,
+            GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR,
+            on_events,
+        )
+
+    # Poll fast right after the close requests, escalate each app on time
+    scheduler.start()
+    arm_deadline()
+    if manager.waves_pending():
+        scheduler.call_later(config.waves.interval, on_wave)
+    if history_future:
+        # Done callbacks run in the worker thread, hand over to the loop
+        history_future.add_done_callback(lambda f: GLib.idle_add(on_history_loaded, f))
+
+    trace.instant("waiting for apps")
+    return cancel
 
 
 if __name__ == "__main__":
@@ -0,0 +1,67 @@
+"""Pressure stall information (PSI) from /proc/pressure."""
+
+import time
+from pathlib import Path
+from typing import Optional
+
+PRESSURE_ROOT = Path("/proc/pressure")
+# Resources whose stalls closing apps cause, flushing profiles and caches
+RESOURCES = ("io", "memory")
+
+
+def read_stall_total(resource: str) -> Optional[int]:
+    """Get the microseconds all busy tasks stalled on a resource since boot.
+
+    That is the ``full`` line: a single task waiting on fsync() already
+    counts as ``some`` pressure, ``full`` means nothing made progress.
+    """
+    try:
+        with open(PRESSURE_ROOT / resource) as f:
+            for line in f:
+                if line.startswith("full "):
+                    return int(line.rsplit("total=", 1)[1])
+    except (IOError, ValueError, IndexError):
+        pass
+    return None
+
+
+class PressureMonitor:
+    """Share of time tasks stalled on IO or memory between two samples.
+
+    PSI's avg10 trails by several seconds, longer than most apps take to
+    close, so the cumulative totals are differenced instead.
+    """
+
+    def __init__(self, resources: tuple[str, ...] = RESOURCES):
+        self._totals: dict[str, int] = {}
+        for resource in resources:
+            total = read_stall_total(resource)
+            if total is not None:
+                self._totals[resource] = total
+        self._time = time.monotonic()
+
+    @property
+    def available(self) -> bool:
+        """Whether the kernel reports pressure (CONFIG_PSI, psi=1)."""
+        return bool(self._totals)
+
+    def sample(self) -> Optional[float]:
+        """Get the highest stall percentage since the last sample.
+
+        Returns None if pressure can't be read (anymore).
+        """
+        now = time.monotonic()
+        interval = now - self._time
+        if not self._totals or interval <= 0:
+            return None
+
+        pressure = None
+        for resource, last in self._totals.items():
+            total = read_stall_total(resource)
+            if total is None:
+                continue
+            self._totals[resource] = total
+            stalled = (total - last) / 1e6 / interval * 100
+            pressure = stalled if pressure is None else max(pressure, stalled)
+        self._time = now
+        return pressure
@@ -0,0 +1,214 @@
+"""Process exit notification via pidfd and cgroup.events."""
+
+import ctypes
+import logging
+import os
+import select
+import struct
+import time
+from typing import Callable, Iterable
+
+from gi.repository import GLib
+
+from . import cgroup
+from .procfs import DEAD_STATES, read_stat
+
+logger = logging.getLogger("hyprhalt")
+
+
+class ProcessWatcher:
+    """Reports process exits through pidfds registered with the GLib loop.
+
+    A pidfd becomes readable the moment its process exits, so exits are
+    noticed without polling. PIDs that can't be watched (no pidfd support
+    in the kernel) are left to the caller to poll.
+    """
+
+    def __init__(self, on_exit: Callable[[int], None]):
+        self.on_exit = on_exit
+        self._watches: dict[int, tuple[int, int]] = {}  # pid -> (fd, source id)
+        self._supported = hasattr(os, "pidfd_open")
+
+    def watch(self, pid: int) -> bool:
+        """Start watching a PID. Returns False if it has to be polled."""
+        if pid in self._watches:
+            return True
+        if pid <= 0 or not self._supported:
+            return False
+
+        try:
+            fd = os.pidfd_open(pid)
+        except ProcessLookupError:
+            # Already gone, report it from the loop like any other exit
+            GLib.idle_add(self._report_exit, pid)
+            return True
+        except OSError as e:
+            logger.debug(f"pidfd unavailable, polling PID {pid} instead: {e}")
+            self._supported = False
+            return False
+
+        source = GLib.io_add_watch(
+            fd,
+            GLib.PRIORITY_DEFAULT,
+            GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR,
+            self._on_ready,
+            pid,
+        )
+        self._watches[pid] = (fd, source)
+        return True
+
+    def unwatch(self, pid: int):
+        """Stop watching a PID and release its pidfd."""
+        watch = self._watches.pop(pid, None)
+        if watch:
+            fd, source = watch
+            GLib.source_remove(source)
+            os.close(fd)
+
+    def close(self):
+        """Release all pidfds."""
+        for pid in list(self._watches):
+            self.unwatch(pid)
+
+    def _on_ready(self, fd, condition, pid):
+        fd, _ = self._watches.pop(pid)
+        os.close(fd)
+        self.on_exit(pid)
+        return False
+
+    def _report_exit(self, pid):
+        self.on_exit(pid)
+        return False
+
+
+def wait_for_exit(pids: Iterable[int], timeout: float) -> set[int]:
+    """Block until the processes exit or timeout seconds pass.
+
+    All processes are waited on at once through their pidfds, PIDs without
+    one are polled. Returns the PIDs still running.
+    """
+    deadline = time.monotonic() + timeout
+    poller = select.poll()
+    fds: dict[int, int] = {}  # pidfd -> pid
+    polled = set()
+    for pid in pids:
+        try:
+            fd = os.pidfd_open(pid)
+        except ProcessLookupError:
+            continue
+        except (OSError, AttributeError):
+            polled.add(pid)
+            continue
+        fds[fd] = pid
+        poller.register(fd, select.POLLIN)
+
+    try:
+        while fds or polled:
+            remaining_ms = (deadline - time.monotonic()) * 1000
+            if remaining_ms <= 0:
+                break
+            if polled:
+                remaining_ms = min(remaining_ms, 10)
+            for fd, _ in poller.poll(remaining_ms):
+                poller.unregister(fd)
+                os.close(fd)
+                del fds[fd]
+            polled = {pid for pid in polled if _running(pid)}
+    finally:
+        for fd in fds:
+            os.close(fd)
+    return set(fds.values()) | polled
+
+
+def _running(pid: int) -> bool:
+    record = read_stat(pid)
+    return record is not None and record.state not in DEAD_STATES
+
+
+IN_MODIFY = 0x00000002
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class CgroupWatcher:
+    """Reports cgroups becoming empty via inotify on cgroup.events.
+
+    The kernel flags cgroup.events as modified whenever its ``populated``
+    key flips, so completion of a whole app unit is noticed without
+    polling. Without inotify, watch() returns False and callers poll.
+    """
+
+    def __init__(self, on_empty: Callable[[str], None]):
+        self.on_empty = on_empty
+        self._paths: dict[int, str] = {}  # watch descriptor -> cgroup
+        self._fd = -1
+        self._source = None
+
+        try:
+            self._libc = ctypes.CDLL(None, use_errno=True)
+            fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError) as e:
+            logger.debug(f"inotify unavailable, polling cgroups instead: {e}")
+            return
+
+        if fd < 0:
+            return
+
+        self._fd = fd
+        self._source = GLib.io_add_watch(
+            fd, GLib.PRIORITY_DEFAULT, GLib.IO_IN, self._on_ready
+        )
+
+    def watch(self, path: str) -> bool:
+        """Start watching a cgroup. Returns False if it has to be polled."""
+        if path in self._paths.values():
+            return True
+        if self._fd < 0:
+            return False
+
+        wd = self._libc.inotify_add_watch(
+            self._fd, cgroup.events_file(path).encode(), IN_MODIFY
+        )
+        if wd < 0:
+            return False
+
+        self._paths[wd] = path
+        # It may have emptied before the watch was in place
+        if not cgroup.is_populated(path):
+            GLib.idle_add(self._report_empty, wd)
+        return True
+
+    def close(self):
+        """Stop watching and release the inotify instance."""
+        if self._source:
+            GLib.source_remove(self._source)
+            self._source = None
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._paths.clear()
+
+    def _on_ready(self, fd, condition):
+        try:
+            data = os.read(fd, 4096)
+        except BlockingIOError:
+            return True
+
+        offset = 0
+        changed = set()
+        while offset + _INOTIFY_EVENT.size <= len(data):
+            wd, _, _, name_len = _INOTIFY_EVENT.unpack_from(data, offset)
+            changed.add(wd)
+            offset += _INOTIFY_EVENT.size + name_len
+
+        for wd in changed:
+            path = self._paths.get(wd)
+            if path and not cgroup.is_populated(path):
+                self._report_empty(wd)
+        return True
+
+    def _report_empty(self, wd):
+        path = self._paths.pop(wd, None)
+        if path:
+            self._libc.inotify_rm_watch(self._fd, wd)
+            self.on_empty(path)
+        return False
@@ -0,0 +1,109 @@
+"""Single-pass /proc snapshots with parent/child indexes."""
+
+import os
+from collections import deque
+from typing import Container, NamedTuple, Optional
+
+# Process states (the third field of /proc/<pid>/stat)
+DEAD_STATES = frozenset("ZXx")  # zombie or dead, the process has exited
+STOPPED_STATES = frozenset("Tt")  # stopped by a signal or a debugger
+BLOCKED_STATE = "D"  # uninterruptible sleep, usually waiting on IO
+
+
+class ProcRecord(NamedTuple):
+    """Fields of /proc/<pid>/stat that hyprhalt cares about."""
+
+    pid: int
+    comm: str
+    state: str
+    ppid: int
+    pgrp: int
+    starttime: int
+
+
+def parse_stat(data: bytes) -> Optional[ProcRecord]:
+    """Parse the contents of a /proc/<pid>/stat file."""
+    # comm may contain spaces and parentheses, so split around the outer pair
+    lpar = data.find(b"(")
+    rpar = data.rfind(b")")
+    if lpar < 0 or rpar < lpar:
+        return None
+
+    fields = data[rpar + 2 :].split()
+    if len(fields) < 20:
+        return None
+
+    try:
+        return ProcRecord(
+            pid=int(data[:lpar]),
+            comm=data[lpar + 1 : rpar].decode(errors="replace"),
+            state=fields[0].decode(),
+            ppid=int(fields[1]),
+            pgrp=int(fields[2]),
+            starttime=int(fields[19]),
+        )
+    except ValueError:
+        return None
+
+
+def read_stat(pid: int, proc_dir: str = "/proc") -> Optional[ProcRecord]:
+    """Read a single process's stat record, or None if it is gone."""
+    try:
+        fd = os.open(f"{proc_dir}/{pid}/stat", os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        data = os.read(fd, 4096)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+    return parse_stat(data)
+
+
+class ProcSnapshot:
+    """Point-in-time view of all processes, indexed by PID and parent."""
+
+    def __init__(self, records: dict[int, ProcRecord]):
+        self.by_pid = records
+        self.children: dict[int, list[int]] = {}
+        for record in records.values():
+            self.children.setdefault(record.ppid, []).append(record.pid)
+
+    @classmethod
+    def take(cls, proc_dir: str = "/proc") -> "ProcSnapshot":
+        """Scan /proc once and build the indexes."""
+        records = {}
+        try:
+            with os.scandir(proc_dir) as entries:
+                for entry in entries:
+                    if not entry.name.isdigit():
+                        continue
+                    record = read_stat(int(entry.name), proc_dir)
+                    if record:
+                        records[record.pid] = record
+        except OSError:
+            pass
+        return cls(records)
+
+    def get(self, pid: int) -> Optional[ProcRecord]:
+        return self.by_pid.get(pid)
+
+    def children_of(self, pid: int) -> list[ProcRecord]:
+        """Direct children of a process."""
+        return [self.by_pid[child] for child in self.children.get(pid, ())]
+
+    def descendants(self, pid: int, prune: Container[int] = ()) -> list[ProcRecord]:
+        """All processes below a PID in the tree, breadth first.
+
+        PIDs in prune are left out along with everything below them.
+        """
+        result = []
+        queue = deque(self.children.get(pid, ()))
+        while queue:
+            child = queue.popleft()
+            if child in prune:
+                continue
+            result.append(self.by_pid[child])
+            queue.extend(self.children.get(child, ()))
+        return result
@@ -0,0 +1,271 @@
+"""Resident mode: stay running and start shutdowns on request.
+
+``hyprhalt --resident`` is meant to be started with the session, from
+``exec-once`` or a systemd user unit. It imports the shutdown machinery,
+loads the config, owns the D-Bus name and keeps the client list current
+from socket2 events ahead of time. ``hyprhalt`` then only sends a request
+over a UNIX socket (see client.py), or anything can call StartShutdown on
+D-Bus.
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Optional
+
+from gi.repository import GLib
+
+from . import hyprland_ipc
+from .async_ipc import AsyncIPC
+from .client import get_socket_path
+from .config import load_config
+from .dbus_service import start_service
+from .main import start_shutdown
+
+logger = logging.getLogger("hyprhalt")
+
+# Window events that change the client list
+CLIENT_EVENTS = ("openwindow", "closewindow")
+# Milliseconds to wait for more window events before refreshing the list
+REFRESH_DELAY_MS = 100
+
+
+class ResidentDaemon:
+    """Keeps everything a shutdown needs warm and starts one on request."""
+
+    def __init__(self, args):
+        self.args = args
+        self.config = load_config()
+        self.loop = GLib.MainLoop()
+        self.busy = False
+        self._cancel = None
+        self._dry_run = False
+        self._no_exit = False
+        # Current j/clients, None while window events made it stale
+        self.clients: Optional[list[hyprland_ipc.ClientInfo]] = None
+        self._refresh_source = None
+        self._events_source = None
+        # Refreshes run while requests and D-Bus calls are served
+        self.ipc = AsyncIPC()
+        self.listener: Optional[hyprland_ipc.EventListener] = None
+
+        self.path = get_socket_path()
+        self.server = self._listen()
+        GLib.io_add_watch(self.server.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN, self._on_request)
+
+        try:
+            self.dbus_service = start_service(None, args.verbose, on_start=self.start_from_dbus)
+        except Exception as e:
+            logger.warning(f"Failed to start D-Bus service: {e}")
+            self.dbus_service = None
+
+        for signum, handler in ((signal.SIGHUP, self._reload_config), (signal.SIGTERM, self.stop)):
+            GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signum, handler)
+
+    def _listen(self) -> socket.socket:
+        """Bind the request socket, refusing to replace a live daemon."""
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+            raise RuntimeError(f"another resident hyprhalt is listening on {self.path}")
+        except (FileNotFoundError, ConnectionRefusedError):
+            pass
+        finally:
+            probe.close()
+
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        os.chmod(self.path, 0o600)
+        server.listen(4)
+        server.setblocking(False)
+        return server
+
+    def run(self):
+        """Serve requests until Hyprland exits or the daemon is stopped."""
+        self._connect_events()
+        self._refresh_clients()
+        logger.info(f"Resident hyprhalt listening on {self.path}")
+        try:
+            self.loop.run()
+        except KeyboardInterrupt:
+            logger.info("Interrupted by user")
+        finally:
+            self.close()
+
+    def stop(self):
+        """Stop serving (SIGTERM handler)."""
+        if self._cancel:
+            self._cancel()
+        self.loop.quit()
+        return False
+
+    def close(self):
+        self.server.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self.ipc.close()
+        if self.listener:
+            self.listener.close()
+
+    def _reload_config(self):
+        """Re-read the config file (SIGHUP handler)."""
+        try:
+            self.config = load_config()
+            logger.info("Configuration reloaded")
+        except Exception as e:
+            logger.error(f"Failed to reload configuration: {e}")
+        return True
+
+    def _connect_events(self):
+        try:
+            self.listener = hyprland_ipc.EventListener()
+        except Exception as e:
+            logger.warning(f"Failed to connect to Hyprland event socket: {e}")
+            return
+        self._watch_events()
+
+    def _watch_events(self):
+        if self.listener and not self.listener.closed:
+            self._events_source = GLib.io_add_watch(
+                self.listener.fileno(),
+                GLib.PRIORITY_DEFAULT,
+                GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR,
+                self._on_events,
+            )
+
+    def _on_events(self, fd, condition):
+        """Mark the client list stale when windows open or close."""
+        if any(name in CLIENT_EVENTS for name, _ in self.listener.read_events()):
+            self.clients = None
+            if self._refresh_source is None:
+                self._refresh_source = GLib.timeout_add(REFRESH_DELAY_MS, self._refresh_clients)
+
+        if self.listener.closed:
+            logger.info("Hyprland event socket closed, exiting")
+            self._events_source = None
+            self.loop.quit()
+            return False
+        return True
+
+    def _refresh_clients(self):
+        self._refresh_source = None
+        self.ipc.request("j/clients", self._on_clients)
+        return False
+
+    def _on_clients(self, reply):
+        # Only current if no window opened or closed since, which would
+        # have scheduled another refresh
+        if reply is None or self._refresh_source is not None:
+            return
+        try:
+            self.clients = hyprland_ipc.parse_client_fields(reply)
+        except ValueError as e:
+            logger.debug(f"Failed to refresh clients: {e}")
+
+    def _on_request(self, fd, condition):
+        try:
+            conn, _ = self.server.accept()
+        except BlockingIOError:
+            return True
+
+        with conn:
+            conn.settimeout(1.0)
+            try:
+                request = json.loads(conn.makefile("rb").readline())
+            except (OSError, ValueError) as e:
+                logger.warning(f"Invalid shutdown request: {e}")
+                return True
+
+            error = self.start(request)
+            try:
+                conn.sendall(json.dumps({"ok": error is None, "error": error}).encode() + b"\n")
+            except OSError:
+                pass
+        return True
+
+    def start_from_dbus(self, post_cmd: Optional[str], vt: Optional[int], text: str) -> bool:
+        """StartShutdown D-Bus method handler."""
+        error = self.start({"post_cmd": post_cmd, "vt": vt, "text": text})
+        if error:
+            logger.warning(f"StartShutdown refused: {error}")
+        return error is None
+
+    def start(self, request: dict) -> Optional[str]:
+        """Start a shutdown. Returns an error message if it wasn't started."""
+        if self.busy:
+            return "a shutdown is already running"
+
+        args = argparse.Namespace(
+            post_cmd=request.get("post_cmd"),
+            vt=request.get("vt"),
+            text=request.get("text") or "Exiting",
+            dry_run=bool(request.get("dry_run")),
+            no_exit=bool(request.get("no_exit")),
+            trace=self.args.trace or bool(request.get("trace")),
+            verbose=self.args.verbose,
+        )
+        # CLOCK_MONOTONIC is system-wide, so the client's timestamp counts
+        started = request.get("started") or time.monotonic()
+        logger.debug(
+            f"Shutdown requested, {(time.monotonic() - started) * 1000:.1f} ms after invocation"
+        )
+
+        self.busy = True
+        self.ipc.close()
+        self._dry_run = args.dry_run
+        self._no_exit = args.no_exit
+        # The shutdown takes over the event listener until it is over
+        if self._events_source:
+            GLib.source_remove(self._events_source)
+            self._events_source = None
+
+        self._cancel = start_shutdown(
+            args,
+            started,
+            self._on_done,
+            config=self.config,
+            event_listener=self.listener,
+            clients=self.clients,
+            dbus_service=self.dbus_service,
+        )
+        return None
+
+    def _on_done(self, result: str):
+        self.busy = False
+        self._cancel = None
+        if self.dbus_service:
+            self.dbus_service.manager = None
+
+        if result == "done" and not (self._dry_run or self._no_exit):
+            # Hyprland is exiting, and the session with it
+            self.loop.quit()
+            return
+
+        logger.debug(f"Shutdown {result}, waiting for the next request")
+        self.clients = None
+        self._watch_events()
+        self._refresh_clients()
+
+
+def run_resident(args):
+    """Run the resident daemon in the foreground."""
+    try:
+        daemon = ResidentDaemon(args)
+    except (OSError, RuntimeError) as e:
+        logger.error(f"Failed to start resident daemon: {e}")
+        sys.exit(1)
+
+    daemon.run()
+    sys.exit(0)
@@ -0,0 +1,90 @@
+"""Adaptive polling and one-shot deadlines on the GLib main loop."""
+
+import logging
+from typing import Callable
+
+from gi.repository import GLib
+
+logger = logging.getLogger("hyprhalt")
+
+
+class TickScheduler:
+    """Runs a poll callback with backoff and fires deadline timers.
+
+    Polling starts at ``min_interval_ms`` (most apps exit within a few
+    hundred milliseconds of a close request) and doubles after every tick
+    up to ``max_interval_ms``. hurry() drops back to the fast rate, e.g.
+    after signals were sent. Deadlines get their own one-shot timers, so
+    they fire on time regardless of the current poll interval.
+    """
+
+    def __init__(
+        self,
+        tick: Callable[[], bool],
+        min_interval_ms: int = 50,
+        max_interval_ms: int = 500,
+    ):
+        self._tick = tick
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max_interval_ms
+        self.interval_ms = min_interval_ms
+        self._tick_source = None
+        self._timers: set[int] = set()
+        self._stopped = False
+
+    def start(self):
+        """Start polling at the fast rate."""
+        self._stopped = False
+        self._arm()
+
+    def hurry(self):
+        """Poll again soon and restart the backoff."""
+        if self._stopped:
+            return
+        self.interval_ms = self.min_interval_ms
+        if self._tick_source:
+            GLib.source_remove(self._tick_source)
+        self._arm()
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> int:
+        """Run callback once after delay seconds. Returns the timer id."""
+        timer_id = 0
+
+        def fire():
+            self._timers.discard(timer_id)
+            if not self._stopped:
+                callback()
+            return False
+
+        timer_id = GLib.timeout_add(max(0, int(delay * 1000)), fire)
+        self._timers.add(timer_id)
+        return timer_id
+
+    def cancel(self, timer_id: int):
+        """Cancel a timer from call_later() that hasn't fired yet."""
+        if timer_id in self._timers:
+            self._timers.discard(timer_id)
+            GLib.source_remove(timer_id)
+
+    def stop(self):
+        """Stop polling and drop all pending timers."""
+        self._stopped = True
+        if self._tick_source:
+            GLib.source_remove(self._tick_source)
+            self._tick_source = None
+        for timer_id in self._timers:
+            GLib.source_remove(timer_id)
+        self._timers.clear()
+
+    def _arm(self):
+        self._tick_source = GLib.timeout_add(self.interval_ms, self._run)
+
+    def _run(self):
+        self._tick_source = None
+        if self._stopped or not self._tick():
+            return False
+
+        if not self._stopped and self._tick_source is None:
+            self.interval_ms = min(self.interval_ms * 2, self.max_interval_ms)
+            self._arm()
+        return False
@@ -7,14 +7,37 @@ import signal
 import subprocess
 import time
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
-from . import hyprland_ipc
-from .app_tracker import App
-from .config import Config
+from . import cgroup, hyprland_ipc, trace
+from .app_tracker import App, AppRegistry, Process
+from .config import Config, RuleConfig
+from .history import History, Sample
+from .pressure import PressureMonitor
+from .process_watch import wait_for_exit
+from .procfs import BLOCKED_STATE, DEAD_STATES, STOPPED_STATES, ProcSnapshot, read_stat
 
 logger = logging.getLogger("hyprhalt")
 
+# Deadline timers have millisecond resolution, don't miss one by rounding
+DEADLINE_SLACK = 0.01
+# Seconds after resuming a stopped app until SIGTERM and SIGKILL
+STOPPED_SIGTERM_DELAY = 1.0
+STOPPED_SIGKILL_DELAY = 3.0
+
+# Shutdown phases in the order they are passed through; the last three
+# are outcomes
+PHASES = (
+    "discovering",
+    "closing",
+    "terminating",
+    "killing",
+    "exiting",
+    "done",
+    "cancelled",
+    "failed",
+)
+
 
 class ShutdownManager:
     """Manages the shutdown process."""
@@ -31,7 +54,15 @@ class ShutdownManager:
         verbose: bool = False,
         custom_text: str = "Exiting",
     ):
-        self.windows = windows
+        self.own_pid = os.getpid()
+        self.phase = PHASES[0]
+        # Called with the new phase on every phase change
+        self.on_phase: Optional[Callable[[str], None]] = None
+        # Called when an app starts or stops waiting on a close dialog,
+        # which moves its escalation deadlines
+        self.on_awaiting: Optional[Callable[[], None]] = None
+        # Remaining apps, grouped by process; hyprhalt never tracks itself
+        self.windows = AppRegistry(self.own_pid)
         self.layers = layers
         self.config = config
         self.start_time = time.time()
@@ -41,9 +72,172 @@ class ShutdownManager:
         self.post_cmd = post_cmd
         self.vt_switch = vt_switch
         self.verbose = verbose
-        self.own_pid = os.getpid()
-        self._windowless_pids_termed: set[int] = set()
         self.custom_text = custom_text
+        # The registry's open windows are kept current by socket2 events
+        # while event_driven is set
+        self.event_driven = False
+        # AsyncIPC for compositor queries from the main loop, set by the
+        # caller; without one they block
+        self.ipc = None
+        # Opened windows whose owner is still being looked up, and those
+        # taken for close dialogs with the process showing them
+        self._indexing = 0
+        self._dialogs: dict[str, Process] = {}
+        # PIDs a skip rule matched, left alone even when run from an app
+        self._skipped: set[int] = set()
+        # Helper PID -> the app process it belongs to, for exit reports
+        self._helpers: dict[int, Process] = {}
+        # PIDs whose exit is reported by a ProcessWatcher instead of polling
+        self._watched_pids: set[int] = set()
+        self._process_watcher = None
+        # cgroups reported empty, and those an inotify watch reports on
+        self._empty_cgroups: set[str] = set()
+        self._watched_cgroups: set[str] = set()
+        self._protected_cgroups: Optional[list[str]] = None
+        # App cgroups by the one process using them, and those shared by
+        # several tracked processes or holding processes outside the app's
+        # tree (tmux servers, nohup jobs), which are never used
+        self._cgroup_owners: dict[str, Process] = {}
+        self._shared_cgroups: set[str] = set()
+        # Close history, set once loaded; samples of this run go to it
+        self.history: Optional[History] = None
+        self.forced = False
+        self._samples: list[tuple[str, Sample]] = []
+        # Layer processes sent SIGTERM, waited on before Hyprland exits
+        self._stopped_layers: set[int] = set()
+        # Heavy apps waiting for a close wave and those released so far,
+        # with the number allowed to close at once
+        self._queued: list[Process] = []
+        self._released: list[Process] = []
+        self._wave_size = config.waves.concurrency
+        self._pressure: Optional[PressureMonitor] = None
+        self.add_windows(windows)
+
+    def add_windows(self, apps: list[App]):
+        """Start tracking more windows, e.g. as discovery results arrive.
+
+        Windows of an already tracked process join it, and windowless
+        entries for such a process (Hyprland children) are dropped.
+        """
+        new = []
+        for app in apps:
+            rule = None
+            if app.pid not in self.windows.by_pid:
+                rule = self._match_rule(app)
+                if rule and rule.action == "skip":
+                    logger.debug(f"Rule skips {app.class_name} (PID {app.pid})")
+                    if app.pid > 0:
+                        self._skipped.add(app.pid)
+                    continue
+
+            process = self.windows.add(app)
+            if app.process is None:
+                continue
+            if process:
+                self._set_timeline(process, rule)
+                new.append(process)
+        self._assign_cgroups(new)
+
+    def _match_rule(self, app: App) -> Optional[RuleConfig]:
+        rules = self.config.rules
+        if not len(rules):
+            return None
+        comm = None
+        if rules.needs_comm and app.pid > 0:
+            record = read_stat(app.pid)
+            comm = record.comm if record else None
+        values = {"class_name": app.class_name, "comm": comm}
+        return rules.match(values, app.is_xwayland)
+
+    def _set_timeline(self, process: Process, rule: Optional[RuleConfig]):
+        """Set a new process's escalation timeline from its rule or history."""
+        timing = self.config.timing
+        process.sigterm_delay = timing.sigterm_delay
+        process.sigkill_delay = timing.sigkill_delay
+        name = process.app.class_name
+
+        if rule:
+            if rule.action or rule.sigterm_delay is not None or rule.sigkill_delay is not None:
+                process.policy = "rule"
+            if rule.action == "kill":
+                process.sigterm_delay = process.sigkill_delay = 0.0
+            else:
+                if rule.sigterm_delay is not None:
+                    process.sigterm_delay = rule.sigterm_delay
+                if rule.sigkill_delay is not None:
+                    process.sigkill_delay = rule.sigkill_delay
+                process.sigkill_delay = max(process.sigkill_delay, process.sigterm_delay)
+            if rule.grace is not None:
+                process.grace = rule.grace
+            logger.debug(
+                f"Rule for {name} (PID {process.pid}): grace={process.grace}s, "
+                f"sigterm={process.sigterm_delay}s, sigkill={process.sigkill_delay}s"
+            )
+
+        if process.policy == "default":
+            self._apply_history(process)
+
+    def set_history(self, history: History):
+        """Use close history to tune apps without a rule for their timeline."""
+        self.history = history
+        for process in self.windows.processes():
+            if process.policy == "default":
+                self._apply_history(process)
+
+    def _apply_history(self, process: Process):
+        if not self.history:
+            return
+        name = process.app.class_name
+        # History deals in time since the close request, keep any shift
+        shift = process.timeline_shift
+        deadlines = self.history.deadlines(
+            name, process.grace, process.sigterm_delay - shift, process.sigkill_delay - shift
+        )
+        if deadlines:
+            process.grace = deadlines.grace
+            process.sigterm_delay = deadlines.sigterm_delay + shift
+            process.sigkill_delay = deadlines.sigkill_delay + shift
+            process.policy = "learned"
+            logger.debug(
+                f"Learned timeline for {name}: grace={process.grace:.1f}s, "
+                f"sigterm={process.sigterm_delay:.1f}s, sigkill={process.sigkill_delay:.1f}s"
+            )
+
+    def _add_sample(self, process: Process):
+        """Remember how long an app took to exit and what it needed."""
+        if self.dry_run or self.forced:
+            return
+        if process.sigkill_sent:
+            outcome = "sigkill"
+        elif process.sigterm_sent:
+            outcome = "sigterm"
+        else:
+            # Includes a SIGTERM after the app closed its own windows
+            outcome = "closed"
+        # Time since the close request, without the wave queue or the
+        # user deciding on a dialog
+        seconds = self.elapsed() - process.timeline_shift
+        if process.awaiting_user:
+            seconds -= self.elapsed() - process.paused_at
+        self._samples.append((process.app.class_name, Sample(seconds, outcome)))
+
+    def history_samples(self) -> list[tuple[str, Sample]]:
+        """Samples of this run, counting apps still dying as killed."""
+        for process in self.windows.processes():
+            if process.sigkill_sent:
+                self._add_sample(process)
+        samples, self._samples = self._samples, []
+        return samples
+
+    def set_phase(self, phase: str):
+        """Move on to a later phase, earlier ones are never re-entered."""
+        if PHASES.index(phase) <= PHASES.index(self.phase):
+            return
+        logger.debug(f"Phase {self.phase} -> {phase} at {self.elapsed():.2f}s")
+        self.phase = phase
+        trace.instant("phase", phase=phase)
+        if self.on_phase:
+            self.on_phase(phase)
 
     def elapsed(self) -> float:
         """Get elapsed time since start."""
@@ -67,48 +261,414 @@ class ShutdownManager:
             except Exception as e:
                 logger.warning(f"Failed to start UI: {e}")
 
-    def close_ui(self):
-        """Kill UI process."""
-        if self.ui_process:
+    def close_ui(self) -> Optional[subprocess.Popen]:
+        """Ask the UI to exit without waiting for it. Returns its process."""
+        ui_process, self.ui_process = self.ui_process, None
+        if ui_process:
             try:
-                self.ui_process.terminate()
-                self.ui_process.wait(timeout=1)
-            except subprocess.TimeoutExpired:
-                self.ui_process.kill()
-            self.ui_process = None
+                ui_process.terminate()
+            except OSError:
+                pass
+        return ui_process
+
+    def app_states(self) -> list[dict]:
+        """Describe the remaining windows for the UI, one entry each."""
+        return [
+            {
+                "key": app.address or f"pid:{app.pid}",
+                "appName": app.class_name,
+                "appStatus": self._app_status(app),
+                "pid": app.pid,
+            }
+            for app in self.windows
+        ]
+
+    @staticmethod
+    def _app_status(app: App) -> str:
+        if app.process.queued:
+            return "queued"
+        if app.process.awaiting_user:
+            return "awaiting-user"
+        if app.process.blocked:
+            return "blocked"
+        return app.status
 
     def graceful_close_windows(self):
         """Close all windows gracefully."""
+        self.set_phase("closing")
         if self.dry_run:
             logger.info(f"[DRY RUN] Would close {len(self.windows)} windows")
             return
 
-        for app in self.windows:
-            app.quit()
+        # Send every closewindow in one batched request, apps a rule kills
+        # right away don't get one
+        ipc_apps = [
+            app
+            for app in self.windows
+            if app.should_close_via_ipc() and app.process.sigkill_delay > 0
+        ]
+        ipc_apps = self._queue_heavy(ipc_apps)
+        try:
+            with trace.span("graceful close", windows=len(ipc_apps)):
+                results = hyprland_ipc.close_windows([app.address for app in ipc_apps])
+        except Exception as e:
+            logger.warning(f"Batched close failed, closing windows one by one: {e}")
+            for process in self._queued:
+                process.queued = False
+            self._queued = []
+            for app in self.windows:
+                app.quit()
+                trace.app_event("close requested", app, ok=app.status == "closing")
+            return
+
+        self._mark_closing(ipc_apps, results)
+
+    def _queue_heavy(self, apps: list[App]) -> list[App]:
+        """Hold back heavy apps beyond the first wave, return the rest.
+
+        Browsers, IDEs and mail clients flush their profiles when asked to
+        close. Closing all of them at once makes the flushes compete for
+        the disk, so with pressure stall information they go out in waves
+        sized by release_wave(). Without it everything closes at once.
+        """
+        # Position of each app, to release heavy apps in window order
+        closing = {id(app): i for i, app in enumerate(apps)}
+        heavy: dict[Process, int] = {}
+        for class_name in self.config.waves.heavy:
+            for app in self.windows.by_class.get(class_name, {}).values():
+                i = closing.get(id(app))
+                if i is not None and heavy.get(app.process, i) >= i:
+                    heavy[app.process] = i
+        processes = sorted(heavy, key=heavy.get)
+        if len(processes) <= self._wave_size:
+            self._released.extend(processes)
+            return apps
+
+        self._pressure = PressureMonitor()
+        if not self._pressure.available:
+            logger.debug("No pressure stall information, closing heavy apps at once")
+            self._pressure = None
+            self._released.extend(processes)
+            return apps
+
+        self._released.extend(processes[: self._wave_size])
+        self._queued = processes[self._wave_size :]
+        for process in self._queued:
+            process.queued = True
+        logger.debug(
+            f"Closing {self._wave_size} of {len(processes)} heavy apps first, "
+            f"{len(self._queued)} queued"
+        )
+        trace.instant("close waves", heavy=len(processes), queued=len(self._queued))
+        return [app for app in apps if not app.process.queued]
+
+    def waves_pending(self) -> bool:
+        """Whether heavy apps are still waiting for a close wave."""
+        return bool(self._queued)
+
+    def release_wave(self, sample: bool = True) -> int:
+        """Close more heavy apps as far as IO and memory pressure allow.
+
+        With sample set (every waves.interval), the wave size doubles if
+        the stall percentage since the last sample stayed below
+        pressure_limit and halves above it, down to one. Without, only
+        the places of heavy apps that finished are filled. Apps waiting on
+        the user or already sent SIGKILL don't hold a place, and once the
+        default sigterm_delay has passed every queued app goes at once.
+        Released apps get their timeline from now on, since their close
+        request only goes out now. Returns the number of apps released.
+        """
+        self._queued = [p for p in self._queued if self.windows.by_pid.get(p.pid) is p]
+        if not self._queued:
+            return 0
 
-    def close_all_layers(self):
-        """Close all layer shells."""
+        pressure = None
+        if sample:
+            pressure = self._pressure.sample()
+            if pressure is None:
+                self._wave_size = len(self._queued)
+            elif pressure < self.config.waves.pressure_limit:
+                self._wave_size *= 2
+            else:
+                self._wave_size = max(1, self._wave_size // 2)
+
+        elapsed = self.elapsed()
+        if elapsed >= self.config.timing.sigterm_delay:
+            # Pressure that never eases must not hold apps back until the
+            # ones before them are killed, one sigkill_delay after another
+            count = len(self._queued)
+        else:
+            closing = sum(
+                1
+                for p in self._released
+                if self.windows.by_pid.get(p.pid) is p
+                and not (p.exited or p.awaiting_user or p.sigkill_sent)
+            )
+            count = self._wave_size - closing
+        if count <= 0:
+            return 0
+
+        wave, self._queued = self._queued[:count], self._queued[count:]
+        for process in wave:
+            process.queued = False
+            process.timeline_start = elapsed
+            process.sigterm_delay += elapsed
+            process.sigkill_delay += elapsed
+        self._released.extend(wave)
+
+        apps = [app for process in wave for app in process.apps if app.should_close_via_ipc()]
+        pressure_text = f", pressure {pressure:.1f}%" if pressure is not None else ""
+        logger.debug(
+            f"Closing {len(wave)} more heavy apps (wave size {self._wave_size}{pressure_text}), "
+            f"{len(self._queued)} queued"
+        )
+        trace.instant("close wave", apps=len(wave), size=self._wave_size, pressure=pressure)
+        self._close_wave(apps)
+        return len(wave)
+
+    def _close_wave(self, apps: list[App]):
+        addresses = [app.address for app in apps]
+        if self.ipc:
+            self.ipc.request(
+                hyprland_ipc.close_windows_command(addresses),
+                lambda reply: self._on_wave_closed(apps, reply),
+            )
+            return
+        try:
+            results = hyprland_ipc.close_windows(addresses)
+        except Exception as e:
+            logger.warning(f"Failed to close heavy apps: {e}")
+            return
+        self._mark_closing(apps, results)
+
+    def _on_wave_closed(self, apps: list[App], reply: Optional[bytearray]):
+        if reply is None:
+            logger.warning(f"Failed to close {len(apps)} heavy apps")
+            return
+        addresses = [app.address for app in apps]
+        results = hyprland_ipc.parse_close_replies(addresses, reply.decode(errors="replace"))
+        self._mark_closing(apps, results)
+
+    @staticmethod
+    def _mark_closing(apps: list[App], results: dict[str, bool]):
+        for app in apps:
+            if results.get(app.address):
+                app.status = "closing"
+            trace.app_event("close requested", app, ok=bool(results.get(app.address)))
+
+    def stop_layers(self, early: bool = False):
+        """SIGTERM layer shell processes, they can't use closewindow.
+
+        The early stage, while windows are still closing, skips processes
+        with a layer in the keep list (wallpaper, bars, this overlay),
+        processes tracked as apps and those a skip rule matched. The final
+        stage stops everything left.
+        """
+        keep = set(self.config.layers.keep) if early else set()
+        skip = {self.own_pid, hyprland_ipc.get_hyprland_pid()}
+        if self.ui_process:
+            # The overlay is closed by close_ui(), whatever keep says
+            skip.add(self.ui_process.pid)
+        if early:
+            skip.update(layer.pid for layer in self.layers if layer.namespace in keep)
+            skip.update(self.windows.by_pid)
+            skip.update(self._skipped)
+        pids = {layer.pid for layer in self.layers if layer.pid > 0} - skip - self._stopped_layers
+        if not pids:
+            return
+
+        namespaces = sorted({layer.namespace or "?" for layer in self.layers if layer.pid in pids})
+        stage = "early" if early else "final"
+        described = f"{len(pids)} layer processes ({stage}): {', '.join(namespaces)}"
         if self.dry_run:
-            logger.info(f"[DRY RUN] Would close {len(self.layers)} layers")
+            logger.info(f"[DRY RUN] Would stop {described}")
             return
 
-        for layer in self.layers:
-            # Layers need SIGTERM since they can't use closewindow
-            if layer.pid > 0:
-                try:
-                    os.kill(layer.pid, signal.SIGTERM)
-                except OSError:
-                    pass
+        logger.debug(f"Stopping {described}")
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                self._stopped_layers.add(pid)
+            except OSError:
+                pass
+        trace.instant("layers stopped", stage=stage, layers=namespaces)
+
+    def stop_ui(self):
+        """Close the UI when the shutdown ends without exiting (cancel, error).
+
+        Like at the end of a shutdown, a UI that doesn't exit in time is
+        killed, and it is always reaped.
+        """
+        ui_process = self.close_ui()
+        if ui_process:
+            self._wait_for_exit(ui_process, set())
+
+    def _wait_for_exit(self, ui_process: Optional[subprocess.Popen], pids: set[int]):
+        """Give the UI and stopped layers a bounded time to exit together."""
+        pids = set(pids)
+        if ui_process:
+            pids.add(ui_process.pid)
+        left = wait_for_exit(pids, self.config.layers.exit_timeout) if pids else set()
+
+        if ui_process:
+            if ui_process.pid in left:
+                ui_process.kill()
+                left.discard(ui_process.pid)
+            # Reap it, the SIGKILL above takes effect right away
+            try:
+                ui_process.wait(timeout=0.1)
+            except subprocess.TimeoutExpired:
+                pass
+        if left:
+            logger.debug(f"{len(left)} layer processes still running, exiting anyway")
+
+    def _assign_cgroups(self, processes: list[Process]):
+        """Map processes to their own systemd unit cgroups where that is safe."""
+        if not processes or not cgroup.is_available():
+            return
+
+        # Never kill a group that holds hyprhalt or Hyprland itself
+        if self._protected_cgroups is None:
+            protected = [cgroup.get_cgroup(self.own_pid)]
+            hyprland_pid = hyprland_ipc.get_hyprland_pid()
+            if hyprland_pid:
+                protected.append(cgroup.get_cgroup(hyprland_pid))
+            self._protected_cgroups = [path for path in protected if path]
+
+        for process in processes:
+            if process.pid <= 0:
+                continue
+            path = cgroup.find_app_cgroup(process.pid, self._protected_cgroups)
+            if not path or path in self._shared_cgroups:
+                continue
+            # A unit holding several tracked apps (a GUI app started from a
+            # terminal's shell) would tie their fates, use their PIDs
+            owner = self._cgroup_owners.get(path)
+            if owner is not None and owner is not process:
+                logger.debug(f"cgroup {path} holds several apps, signalling them by PID")
+                owner.cgroup = None
+                del self._cgroup_owners[path]
+                self._shared_cgroups.add(path)
+                continue
+            self._cgroup_owners[path] = process
+            process.cgroup = path
+
+        grouped = sum(1 for process in processes if process.cgroup)
+        logger.debug(f"{grouped} of {len(processes)} apps run in their own cgroup")
+
+    def watch_cgroups(self, watcher):
+        """Register every app cgroup with a CgroupWatcher."""
+        for path in {p.cgroup for p in self.windows.processes() if p.cgroup}:
+            if watcher.watch(path):
+                self._watched_cgroups.add(path)
+
+    def mark_cgroup_empty(self, path: str):
+        """Record that an app cgroup has no processes left."""
+        self._empty_cgroups.add(path)
+        process = self._cgroup_owners.get(path)
+        if process:
+            trace.app_event("cgroup empty", process.app, cgroup=path)
+
+    def watch_processes(self, watcher):
+        """Register every tracked PID with a ProcessWatcher."""
+        self._process_watcher = watcher
+        self._watch_trees()
+
+        polled = sum(1 for p in self.windows.processes() if p.pid not in self._watched_pids)
+        if polled:
+            logger.debug(f"Polling {polled} apps without a pidfd")
+
+    def _watch_trees(self):
+        """Watch every app process and descendant not watched yet."""
+        if not self._process_watcher:
+            return
+
+        for process in self.windows.processes():
+            for pid in (process.pid, *process.descendants):
+                if pid not in self._watched_pids and self._process_watcher.watch(pid):
+                    self._watched_pids.add(pid)
+
+    def track_descendants(self, snapshot: ProcSnapshot):
+        """Record the current process tree of every running app."""
+        # Neither hyprhalt and its overlay, other apps nor skipped ones are
+        # anyone's helpers
+        prune = {self.own_pid, *self.windows.by_pid, *self._skipped}
+        for process in self.windows.processes():
+            if not process.exited:
+                process.track_descendants(snapshot, prune)
+                for helper in process.descendants:
+                    self._helpers[helper] = process
+                if process.cgroup:
+                    self._check_cgroup_members(process)
+
+    def _check_cgroup_members(self, process: Process):
+        """Stop using an app's cgroup if it holds more than the app's tree.
+
+        A terminal's unit often also holds a detached tmux or screen
+        server, which would keep it populated until cgroup.kill ended the
+        sessions that used to outlive the terminal.
+        """
+        path = process.cgroup
+        tree = {process.pid, *process.descendants}
+        others = [pid for pid in cgroup.get_pids(path) if pid not in tree]
+        if not others:
+            return
+        logger.debug(
+            f"cgroup {path} holds {len(others)} processes outside "
+            f"{process.app.class_name}'s tree, signalling it by PID"
+        )
+        process.cgroup = None
+        del self._cgroup_owners[path]
+        self._shared_cgroups.add(path)
+
+    def _refresh_trees(self):
+        """Pick up helper processes forked since discovery."""
+        self.track_descendants(ProcSnapshot.take())
+        self._watch_trees()
+
+    def mark_exited(self, pid: int):
+        """Record that a tracked process (app or descendant) exited."""
+        process = self.windows.by_pid.get(pid)
+        if process:
+            process.exited = True
+            trace.app_event("process exited", process.app)
+        process = self._helpers.pop(pid, None)
+        if process and process.descendants.pop(pid, None) is not None:
+            trace.app_event("helper exited", process.app, helper_pid=pid)
 
     def poll_windows(self) -> bool:
-        """Check window status and return True if any are alive."""
-        # Update status
-        for app in self.windows:
-            if not app.is_alive():
-                app.status = "dead"
+        """Check window status and return True if any are alive.
+
+        An app only counts as closed once its whole process tree is gone,
+        and each process is probed once however many windows it has.
+        """
+        # Update status, watched PIDs are marked by mark_exited()
+        dead = []
+        for process in self.windows.processes():
+            if process.cgroup:
+                # The unit's cgroup covers every process the app started
+                path = process.cgroup
+                if path not in self._watched_cgroups and not cgroup.is_populated(path):
+                    self._empty_cgroups.add(path)
+                if path in self._empty_cgroups:
+                    dead.append(process)
+                continue
+
+            if not process.exited and process.pid not in self._watched_pids:
+                process.exited = not process.process_alive()
+            if process.exited and not process.live_descendants():
+                dead.append(process)
 
         # Remove dead apps
-        self.windows = [app for app in self.windows if app.is_alive()]
+        for process in dead:
+            process.set_status("dead")
+            self._add_sample(process)
+            trace.app_event("closed", process.app)
+            self.windows.remove_process(process)
+            for address in process.dialogs:
+                self._dialogs.pop(address, None)
+            for helper in process.descendants:
+                self._helpers.pop(helper, None)
 
         return len(self.windows) > 0
 
@@ -118,65 +678,349 @@ class ShutdownManager:
             return
 
         # Get current client PIDs
+        if self.event_driven:
+            # A window still being looked up may keep its process from
+            # counting as windowless, check again once it is indexed
+            if not self._indexing:
+                self._term_windowless({app.pid for app in self.windows.by_address.values()})
+        elif self.ipc:
+            self.ipc.request("j/clients", self._on_clients_for_windowless)
+        else:
+            try:
+                clients = hyprland_ipc.get_client_fields()
+            except Exception:
+                return
+            self._check_clients(clients)
+
+    def _on_clients_for_windowless(self, reply: Optional[bytearray]):
+        if reply is None:
+            return
         try:
-            clients = hyprland_ipc.get_clients()
-            window_pids = {c.get("pid") for c in clients if c.get("pid")}
-        except Exception:
+            clients = hyprland_ipc.parse_client_fields(reply)
+        except ValueError:
             return
+        self._check_clients(clients)
 
-        for app in self.windows:
-            # Only check apps that originally had a window address
-            if app.pid <= 0 or not app.address:
+    def _check_clients(self, clients: list[hyprland_ipc.ClientInfo]):
+        """Find dialogs and windowless apps from a j/clients diff."""
+        addresses = {client.address for client in clients}
+        for address, process in list(self._dialogs.items()):
+            if address not in addresses:
+                self._dialog_closed(process, address)
+        for client in clients:
+            if client.address in self.windows.by_address or client.address in self._dialogs:
                 continue
+            process = self.windows.by_pid.get(client.pid)
+            if process:
+                self._dialog_opened(process, client.address)
+        self._term_windowless({client.pid for client in clients})
 
-            if app.pid in self._windowless_pids_termed:
+    def _term_windowless(self, window_pids: set[int]):
+        for process in self.windows.processes():
+            # Only check apps that originally had a window address
+            if process.pid <= 0 or process.windowless_termed or not process.has_window():
                 continue
 
-            # If app's window closed but PID is still alive, SIGTERM it
-            if app.pid not in window_pids and app.is_alive():
+            # If app's windows closed but PID is still alive, SIGTERM it
+            # once its grace period is over
+            if process.pid not in window_pids and not process.exited and process.process_alive():
+                now = time.time()
+                if process.windowless_since is None:
+                    process.windowless_since = now
+                if now - process.windowless_since < process.grace:
+                    continue
+
                 logger.debug(
-                    f"Window closed but PID {app.pid} ({app.class_name}) alive, sending SIGTERM"
+                    f"Window closed but PID {process.pid} ({process.app.class_name}) alive, "
+                    f"sending SIGTERM"
                 )
                 try:
-                    os.kill(app.pid, 15)  # SIGTERM
-                    self._windowless_pids_termed.add(app.pid)
+                    os.kill(process.pid, 15)  # SIGTERM
+                    process.windowless_termed = True
+                    trace.app_event(
+                        "signal sent", process.app, signal="SIGTERM", reason="windowless"
+                    )
                 except OSError:
                     pass
 
-    def escalate_sigterm(self):
-        """Re-send SIGTERM to remaining windows."""
+    def check_process_states(self) -> bool:
+        """Act on process states in /proc that kill(pid, 0) can't tell.
+
+        Zombies count as exited. Stopped apps are resumed with SIGCONT and
+        escalated early, since a stopped app never handles closewindow.
+        Apps in uninterruptible sleep are only flagged, no signal helps
+        until their IO completes. Returns True if a timeline changed.
+        """
+        changed = False
+        for process in self.windows.processes():
+            if process.exited:
+                continue
+            record = process.stat()
+            if not record:
+                continue
+
+            state = record.state
+            if state in DEAD_STATES:
+                logger.debug(f"PID {process.pid} ({process.app.class_name}) is a zombie")
+                process.exited = True
+                trace.app_event("process exited", process.app, state=state)
+            elif state in STOPPED_STATES and not process.continued:
+                changed |= self._resume_stopped(process, state)
+
+            blocked = state == BLOCKED_STATE
+            if blocked != process.blocked:
+                process.blocked = blocked
+                if blocked:
+                    logger.debug(
+                        f"PID {process.pid} ({process.app.class_name}) is in uninterruptible sleep"
+                    )
+                trace.app_event("uninterruptible" if blocked else "interruptible", process.app)
+        return changed
+
+    def _resume_stopped(self, process: Process, state: str) -> bool:
+        """SIGCONT a stopped app and pull its escalation forward."""
+        process.continued = True
+        name = process.app.class_name
         if self.dry_run:
-            logger.info(f"[DRY RUN] Would SIGTERM {len(self.windows)} windows")
+            logger.info(f"[DRY RUN] Would SIGCONT stopped PID {process.pid} ({name})")
+            return False
+
+        logger.debug(f"PID {process.pid} ({name}) is stopped, sending SIGCONT")
+        process.signal_tree(signal.SIGCONT)
+        trace.app_event("signal sent", process.app, signal="SIGCONT", state=state)
+
+        elapsed = self.elapsed()
+        sigterm_delay = min(process.sigterm_delay, elapsed + STOPPED_SIGTERM_DELAY)
+        sigkill_delay = min(process.sigkill_delay, elapsed + STOPPED_SIGKILL_DELAY)
+        if (sigterm_delay, sigkill_delay) == (process.sigterm_delay, process.sigkill_delay):
+            return False
+        process.sigterm_delay = sigterm_delay
+        process.sigkill_delay = max(sigkill_delay, sigterm_delay)
+        return True
+
+    def handle_event(self, name: str, data: str):
+        """Update the window index from a Hyprland socket2 event."""
+        if name == "closewindow":
+            address = hyprland_ipc.normalize_address(data)
+            app = self.windows.remove_window(address)
+            if app:
+                logger.debug(f"Window {address} ({app.class_name}) closed")
+                trace.app_event("window gone", app, window=address)
+                if app.process and address in app.process.dialogs:
+                    self._dialog_closed(app.process, address)
+                self.check_windowless_pids()
+        elif name == "openwindow":
+            address = hyprland_ipc.normalize_address(data.split(",", 1)[0])
+            self._index_new_window(address)
+
+    def _index_new_window(self, address: str):
+        """Attribute a window opened during shutdown to a tracked app."""
+        if not self.windows.by_pid:
             return
 
-        logger.info(f"Escalating: sending SIGTERM to {len(self.windows)} remaining windows")
-        for app in self.windows:
-            if app.pid > 0:
-                try:
-                    os.kill(app.pid, 15)  # SIGTERM
-                except OSError:
-                    pass
+        # openwindow carries no PID, so look it up once
+        if self.ipc:
+            self._indexing += 1
+            self.ipc.request("j/clients", lambda reply: self._on_clients_for_window(address, reply))
+            return
+        try:
+            reply = hyprland_ipc.send_command_raw("j/clients")
+        except Exception:
+            return
+        self._attribute_window(address, reply)
+
+    def _on_clients_for_window(self, address: str, reply: Optional[bytearray]):
+        self._indexing -= 1
+        self._attribute_window(address, reply)
+        if not self._indexing:
+            self.check_windowless_pids()
+
+    def _attribute_window(self, address: str, reply: Optional[bytearray]):
+        if reply is None:
+            return
+        try:
+            clients = hyprland_ipc.parse_client_fields(reply)
+        except ValueError:
+            return
+        for client in clients:
+            if client.address == address:
+                process = self.windows.by_pid.get(client.pid)
+                if process:
+                    app = process.app
+                    logger.debug(f"{app.class_name} (PID {app.pid}) opened window {address}")
+                    self.windows.add_window(address, process)
+                    self._dialog_opened(process, address)
+                return
+
+    def _dialog_opened(self, process: Process, address: str):
+        """Pause escalation while an app asks the user about closing.
+
+        A window opened by an app after its close request is taken for a
+        confirmation dialog. The app isn't hung, so its deadlines stop
+        until the dialog closes or dialog_timeout is used up, and the
+        dialog is focused so the user can answer it.
+        """
+        if address in process.dialogs or process.sigkill_sent:
+            return
+        if not any(app.status == "closing" for app in process.apps):
+            return
+        process.dialogs.add(address)
+        self._dialogs[address] = process
+
+        name = process.app.class_name
+        if process.awaiting_user or process.awaited >= self.config.timing.dialog_timeout:
+            return
+        logger.info(f"{name} (PID {process.pid}) is asking the user before closing")
+        process.paused_at = self.elapsed()
+        trace.app_event("awaiting user", process.app, window=address)
+        self._focus_window(address)
+        if self.on_awaiting:
+            self.on_awaiting()
+
+    def _dialog_closed(self, process: Process, address: str):
+        process.dialogs.discard(address)
+        self._dialogs.pop(address, None)
+        if not process.dialogs and process.awaiting_user:
+            logger.debug(f"{process.app.class_name} (PID {process.pid}) dialog answered")
+            self._resume_escalation(process)
+            trace.app_event("user answered", process.app, window=address)
+            if self.on_awaiting:
+                self.on_awaiting()
+
+    def _resume_escalation(self, process: Process):
+        """Unpause an app, moving its pending deadlines by the time paused."""
+        paused = self.elapsed() - process.paused_at
+        process.paused_at = None
+        process.awaited += paused
+        if not process.sigterm_sent:
+            process.sigterm_delay += paused
+        if not process.sigkill_sent:
+            process.sigkill_delay += paused
+
+    def _focus_window(self, address: str):
+        cmd = f"/dispatch focuswindow address:{address}"
+        if self.ipc:
+            self.ipc.request(cmd, lambda reply: None)
+            return
+        try:
+            hyprland_ipc.send_command(cmd)
+        except Exception as e:
+            logger.debug(f"Failed to focus {address}: {e}")
+
+    def next_deadline(self) -> Optional[float]:
+        """Get the earliest pending escalation, in seconds since start."""
+        deadlines = []
+        dialog_timeout = self.config.timing.dialog_timeout
+        for process in self.windows.processes():
+            if process.queued:
+                continue
+            if process.awaiting_user:
+                # Wake up when the app has waited on the user long enough
+                deadlines.append(process.paused_at + dialog_timeout - process.awaited)
+            elif not process.sigterm_sent and process.sigterm_delay < process.sigkill_delay:
+                deadlines.append(process.sigterm_delay)
+            elif not process.sigkill_sent:
+                deadlines.append(process.sigkill_delay)
+        return min(deadlines, default=None)
+
+    def escalate_due(self) -> bool:
+        """Escalate every app whose own deadline has passed.
+
+        Returns True if any signals were sent.
+        """
+        elapsed = self.elapsed() + DEADLINE_SLACK
+        dialog_timeout = self.config.timing.dialog_timeout
+        for process in self.windows.processes():
+            if (
+                process.awaiting_user
+                and process.paused_at + dialog_timeout - process.awaited <= elapsed
+            ):
+                logger.info(
+                    f"{process.app.class_name} (PID {process.pid}) still waiting on the user "
+                    f"after {dialog_timeout:.0f}s, resuming escalation"
+                )
+                self._resume_escalation(process)
+                trace.app_event("dialog timed out", process.app)
+
+        processes = [
+            p for p in self.windows.processes() if not (p.awaiting_user or p.queued)
+        ]
+        kill = [p for p in processes if not p.sigkill_sent and p.sigkill_delay <= elapsed]
+        # An app whose SIGKILL is due as well skips straight to it
+        term = [
+            p
+            for p in processes
+            if not (p.sigterm_sent or p.sigkill_sent)
+            and p.sigterm_delay <= elapsed < p.sigkill_delay
+        ]
+
+        if term:
+            self.escalate_sigterm(term)
+        if kill:
+            self.escalate_sigkill(kill)
+        return bool(term or kill)
+
+    def all_killed(self) -> bool:
+        """Check if every remaining app has been sent SIGKILL."""
+        return all(process.sigkill_sent for process in self.windows.processes())
+
+    def escalate_sigterm(self, processes: Optional[list[Process]] = None):
+        """Re-send SIGTERM to the given (default: all remaining) apps."""
+        processes = list(self.windows.processes()) if processes is None else processes
+        for process in processes:
+            process.sigterm_sent = True
+        self.set_phase("terminating")
+
+        if self.dry_run:
+            logger.info(f"[DRY RUN] Would SIGTERM {len(processes)} apps")
+            return
+
+        logger.info(f"Escalating: sending SIGTERM to {len(processes)} remaining apps")
+        with trace.span("SIGTERM", apps=len(processes)):
+            self._refresh_trees()
+            for process in processes:
+                process.terminate()
+                trace.app_event("signal sent", process.app, signal="SIGTERM")
+
+    def force_kill(self):
+        """SIGKILL everything on the user's request."""
+        # Not a sign the apps were hung, keep this run out of the history
+        self.forced = True
+        self.escalate_sigkill()
+
+    def escalate_sigkill(self, processes: Optional[list[Process]] = None):
+        """Force kill the given (default: all remaining) apps."""
+        processes = list(self.windows.processes()) if processes is None else processes
+        for process in processes:
+            process.sigkill_sent = True
+        self.set_phase("killing")
 
-    def escalate_sigkill(self):
-        """Force kill remaining windows."""
         if self.dry_run:
-            logger.info(f"[DRY RUN] Would SIGKILL {len(self.windows)} windows")
+            logger.info(f"[DRY RUN] Would SIGKILL {len(processes)} apps")
             return
 
-        logger.info(f"Escalating: sending SIGKILL to {len(self.windows)} remaining windows")
-        for app in self.windows:
-            app.kill()
+        logger.info(f"Escalating: sending SIGKILL to {len(processes)} remaining apps")
+        with trace.span("SIGKILL", apps=len(processes)):
+            self._refresh_trees()
+            for process in processes:
+                process.kill()
+                trace.app_event("signal sent", process.app, signal="SIGKILL")
 
     def finish_shutdown(self):
         """Complete shutdown sequence."""
-        self.close_ui()
-        self.close_all_layers()
+        self.set_phase("exiting")
+        # The UI and all remaining layers exit in parallel
+        with trace.span("close layers", layers=len(self.layers)):
+            ui_process = self.close_ui()
+            self.stop_layers()
+            self._wait_for_exit(ui_process, self._stopped_layers)
 
         if not self.no_exit:
             if self.dry_run:
                 logger.info("[DRY RUN] Would exit Hyprland")
             else:
-                hyprland_ipc.exit_hyprland()
+                with trace.span("exit hyprland"):
+                    hyprland_ipc.exit_hyprland()
 
         # VT switch for NVIDIA+SDDM
         if self.vt_switch:
@@ -184,6 +1028,7 @@ class ShutdownManager:
                 logger.info(f"[DRY RUN] Would switch to VT {self.vt_switch}")
             else:
                 try:
+                    trace.instant("chvt", vt=self.vt_switch)
                     subprocess.run(
                         ["sudo", "-n", "chvt", str(self.vt_switch)],
                         check=False,
@@ -200,6 +1045,7 @@ class ShutdownManager:
             else:
                 try:
                     # Run asynchronously like hyprshutdown does
+                    trace.instant("post-cmd", cmd=self.post_cmd)
                     subprocess.Popen(
                         ["/bin/sh", "-c", self.post_cmd],
                         stdout=subprocess.DEVNULL,
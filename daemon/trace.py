@@ -0,0 +1,153 @@
+"""Shutdown tracing in Chrome trace-event format.
+
+Tracing is off unless enable() is called (``--trace``), and again after
+disable(); a resident daemon enables it per shutdown. While off, every
+recording function returns after a single check, so call sites can stay
+in hot paths.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+_events: Optional[list[dict]] = None
+_start_ns = 0
+_pid = 0
+_app_tracks: set[int] = set()
+
+
+class _Span:
+    """Context manager recording a complete ("X") event."""
+
+    __slots__ = ("name", "cat", "args", "start")
+
+    def __init__(self, name: str, cat: str, args: dict):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.monotonic_ns()
+        return self
+
+    def __exit__(self, *exc):
+        if _events is None:
+            # Tracing was turned off while the span was open
+            return False
+        end = time.monotonic_ns()
+        _events.append(
+            {
+                "name": self.name,
+                "cat": self.cat,
+                "ph": "X",
+                "ts": (self.start - _start_ns) / 1000,
+                "dur": (end - self.start) / 1000,
+                "pid": _pid,
+                "tid": threading.get_native_id(),
+                "args": self.args,
+            }
+        )
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def enable(start_ns: Optional[int] = None):
+    """Start recording events, timestamped relative to start_ns."""
+    global _events, _start_ns, _pid
+    _events = []
+    _app_tracks.clear()
+    _start_ns = start_ns if start_ns is not None else time.monotonic_ns()
+    _pid = os.getpid()
+
+
+def disable():
+    """Stop recording and drop the events, e.g. once they are written."""
+    global _events
+    _events = None
+    _app_tracks.clear()
+
+
+def enabled() -> bool:
+    return _events is not None
+
+
+def span(name: str, cat: str = "phase", **args):
+    """Time a block: ``with trace.span("discovery"): ...``."""
+    if _events is None:
+        return _NOOP
+    return _Span(name, cat, args)
+
+
+def app_event(name: str, app, **args):
+    """Record an instant event on an app's own track."""
+    if _events is None:
+        return
+    if app.pid not in _app_tracks:
+        _app_tracks.add(app.pid)
+        _events.append(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": _pid,
+                "tid": app.pid,
+                "args": {"name": f"{app.class_name} ({app.pid})"},
+            }
+        )
+    _events.append(
+        {
+            "name": name,
+            "cat": "app",
+            "ph": "i",
+            "s": "t",
+            "ts": (time.monotonic_ns() - _start_ns) / 1000,
+            "pid": _pid,
+            "tid": app.pid,
+            "args": {"class": app.class_name, "address": app.address, **args},
+        }
+    )
+
+
+def instant(name: str, cat: str = "phase", **args):
+    """Record a process-wide instant event."""
+    if _events is None:
+        return
+    _events.append(
+        {
+            "name": name,
+            "cat": cat,
+            "ph": "i",
+            "s": "p",
+            "ts": (time.monotonic_ns() - _start_ns) / 1000,
+            "pid": _pid,
+            "tid": threading.get_native_id(),
+            "args": args,
+        }
+    )
+
+
+def write(path: Optional[str] = None) -> Optional[str]:
+    """Write recorded events to $XDG_RUNTIME_DIR/hyprhalt-trace.json."""
+    if _events is None:
+        return None
+
+    if path is None:
+        runtime_dir = os.getenv("XDG_RUNTIME_DIR", f"/run/user/{os.getuid()}")
+        path = f"{runtime_dir}/hyprhalt-trace.json"
+
+    with open(path, "w") as f:
+        json.dump({"traceEvents": _events, "displayTimeUnit": "ms"}, f)
+    return path
@@ -0,0 +1,94 @@
+"""Streaming app status channel to the Quickshell UI."""
+
+import json
+import logging
+import os
+import socket
+
+from gi.repository import GLib
+
+logger = logging.getLogger("hyprhalt")
+
+
+class UIChannel:
+    """Pushes app status to the UI as newline-delimited JSON.
+
+    The UI connects to a UNIX socket and gets a full ``snapshot`` message
+    first, then only ``update`` and ``remove`` deltas when an app changes.
+    """
+
+    def __init__(self):
+        runtime_dir = os.getenv("XDG_RUNTIME_DIR", f"/run/user/{os.getuid()}")
+        self.path = f"{runtime_dir}/hyprhalt-ui.sock"
+        self.clients: list[socket.socket] = []
+        self._state: dict[str, dict] = {}
+
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        self.server.listen(4)
+        self.server.setblocking(False)
+        self._source = GLib.io_add_watch(
+            self.server.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN, self._on_connect
+        )
+
+    def publish(self, apps: list[dict]):
+        """Send the changes between the last published state and apps."""
+        state = {app["key"]: app for app in apps}
+
+        messages = []
+        for key, app in state.items():
+            if self._state.get(key) != app:
+                messages.append({"type": "update", "app": app})
+        for key in self._state.keys() - state.keys():
+            messages.append({"type": "remove", "key": key})
+
+        self._state = state
+        if messages:
+            self._send("".join(json.dumps(m) + "\n" for m in messages))
+
+    def close(self):
+        """Disconnect the UI and remove the socket."""
+        if self._source:
+            GLib.source_remove(self._source)
+            self._source = None
+        for client in self.clients:
+            client.close()
+        self.clients.clear()
+        self.server.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _on_connect(self, fd, condition):
+        try:
+            client, _ = self.server.accept()
+        except BlockingIOError:
+            return True
+
+        # Never block the main loop on a UI that stopped reading
+        client.setblocking(False)
+        self.clients.append(client)
+        logger.debug("UI connected to status channel")
+
+        snapshot = {"type": "snapshot", "apps": list(self._state.values())}
+        self._send(json.dumps(snapshot) + "\n", [client])
+        return True
+
+    def _send(self, data: str, clients=None):
+        for client in list(clients or self.clients):
+            try:
+                client.sendall(data.encode())
+            except BlockingIOError:
+                logger.debug("UI stopped reading the status channel, dropping it")
+                client.close()
+                self.clients.remove(client)
+            except OSError:
+                logger.debug("UI disconnected from status channel")
+                client.close()
+                self.clients.remove(client)
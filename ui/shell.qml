@@ -10,11 +10,16 @@ PanelWindow {
     id: root
 
     property var appsList: []
+    property var appsState: ({})
     property var config: ({})
     property bool showModal: false
+    // Where the daemon's sockets and files are, like XDG_RUNTIME_DIR in sh
+    property string runtimeDir: Quickshell.env("XDG_RUNTIME_DIR") || ""
+    // An app asks "Save changes?", get out of the way of its dialog
+    property bool awaitingUser: appsList.some(function(app) { return app.appStatus === "awaiting-user"; })
 
-    aboveWindows: true
-    focusable: true
+    aboveWindows: !awaitingUser
+    focusable: !awaitingUser
     exclusionMode: ExclusionMode.Ignore
     WlrLayershell.namespace: "hyprhalt"
     color: "transparent"
@@ -43,30 +48,50 @@ PanelWindow {
         }
     }
 
-    // Read apps from JSON file periodically
-    Process {
-        id: readAppsProcess
+    // App status pushed by the daemon as newline-delimited JSON
+    function applyStatus(line) {
+        var msg;
+        try {
+            msg = JSON.parse(line);
+        } catch (e) {
+            return;
+        }
 
-        command: ["sh", "-c", "cat \"${XDG_RUNTIME_DIR:-/run/user/$(id -u)}/hyprhalt-apps.json\""]
-        running: true
+        var state = msg.type === "snapshot" ? {} : root.appsState;
+        if (msg.type === "snapshot") {
+            msg.apps.forEach(function(app) { state[app.key] = app; });
+        } else if (msg.type === "update") {
+            state[msg.app.key] = msg.app;
+        } else if (msg.type === "remove") {
+            delete state[msg.key];
+        }
+
+        root.appsState = state;
+        root.appsList = Object.keys(state).map(function(key) { return state[key]; });
+    }
+
+    // Without XDG_RUNTIME_DIR, fall back to /run/user/<uid> like the daemon
+    Process {
+        id: runtimeDirProcess
+        command: ["sh", "-c", "echo \"/run/user/$(id -u)\""]
+        running: root.runtimeDir === ""
 
         stdout: SplitParser {
-            splitMarker: ""
             onRead: function(data) {
-                try {
-                    root.appsList = JSON.parse(data);
-                } catch (e) {}
+                root.runtimeDir = data.trim();
             }
         }
     }
 
-    // Timer to refresh app list
-    Timer {
-        interval: 500
-        running: root.showModal
-        repeat: true
-        onTriggered: {
-            readAppsProcess.running = true;
+    Socket {
+        id: statusSocket
+        path: root.runtimeDir + "/hyprhalt-ui.sock"
+        connected: root.runtimeDir !== ""
+
+        parser: SplitParser {
+            onRead: function(data) {
+                root.applyStatus(data);
+            }
         }
     }
 
@@ -251,7 +276,10 @@ PanelWindow {
                                     Text {
                                         text: modelData.appStatus || "unknown"
                                         color: {
-                                            var rgb = modelData.appStatus === "alive"
+                                            // Apps still running, whether stuck in the kernel or
+                                            // not yet asked to close
+                                            var running = ["alive", "awaiting-user", "blocked", "queued"];
+                                            var rgb = running.indexOf(modelData.appStatus) >= 0
                                                 ? (root.config.colors?.status_alive || "224,175,104").split(",")
                                                 : (root.config.colors?.status_closed || "158,206,106").split(",");
                                             return Qt.rgba(rgb[0]/255, rgb[1]/255, rgb[2]/255, 1);